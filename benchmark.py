@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Tesphase Benchmarks
+Measures the video pipeline and task storage so changes can be compared
+before and after.
+
+Usage: python benchmark.py [render] [text] [parallel] [timeline] [memory] [imports] [tasks]
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from task_io import export_tasks, import_tasks
+from task_storage import JournalStore, SQLiteStore
+from video_renderer import FrameComposer, encode_with_ffmpeg, iter_frames, iter_frames_parallel, write_frames
+from text_layer import TextRenderer, font_id, load_font
+from video_timeline import Timeline
+
+WIDTH, HEIGHT = 1280, 720
+TITLE = "Tesphase Daily Reminder - January 01, 2025"
+LINES = [
+    "Hey babe! Time to work on Tesphase!",
+    "",
+    "Your solar energy startup needs you!",
+    "",
+    "Focus areas for today:",
+    "• Solar panel research",
+    "• Market analysis",
+    "• Partnership development",
+    "",
+    "You've got this! 💚"
+]
+
+
+def draw_overlay(draw, font, width=WIDTH):
+    """Draw the reminder title and lines the same way the bot does."""
+    draw.text((width//2 - 300, 50), TITLE, fill=(255, 255, 255), font=font)
+    y_offset = 150
+    for line in LINES:
+        draw.text((width//2 - 200, y_offset), line, fill=(255, 255, 255), font=font)
+        y_offset += 50
+
+
+def legacy_render_frame(width=WIDTH, height=HEIGHT):
+    """Render one frame the original way: row loop, font reload, full redraw."""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    for y in range(height):
+        color = int(255 * (1 - y / height))
+        frame[y, :] = [0, color//2, color//2]
+    frame_pil = Image.fromarray(frame)
+    # Bypass the font cache: the original renderer loaded the font every frame
+    draw_overlay(ImageDraw.Draw(frame_pil), load_font.__wrapped__(40), width)
+    return np.array(frame_pil)
+
+
+def composer_frames(count, width=WIDTH, height=HEIGHT):
+    """Yield frames from a FrameComposer with the overlay pre-rendered."""
+    font = load_font(40)
+    composer = FrameComposer(width, height)
+    composer.draw_static(lambda draw: draw_overlay(draw, font, width))
+    for i in range(count):
+        yield composer.compose(i)
+
+
+def measure_fps(frames, count):
+    """Consume `count` frames from an iterator and return frames per second."""
+    start = time.perf_counter()
+    for _ in range(count):
+        next(frames)
+    return count / (time.perf_counter() - start)
+
+
+def benchmark_render(count=90):
+    """Compare frame throughput of the legacy renderer and the composer."""
+    print(f"🎬 Frame rendering ({WIDTH}x{HEIGHT}, {count} frames)")
+    legacy = measure_fps((legacy_render_frame() for _ in range(count)), count)
+    composed = measure_fps(composer_frames(count), count)
+    print(f"  Legacy:   {legacy:10.1f} fps")
+    print(f"  Composer: {composed:10.1f} fps")
+    print(f"  Speedup:  {composed / legacy:10.1f}x")
+
+
+def benchmark_text(count=200):
+    """Per-frame overlay text drawn through PIL versus blended from cached line masks."""
+    print(f"🔤 Overlay text ({WIDTH}x{HEIGHT}, {count} frames, {len(LINES) + 1} lines)")
+    font = load_font(40)
+    background = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    def pil_frames():
+        while True:
+            image = Image.fromarray(background)
+            draw_overlay(ImageDraw.Draw(image), font)
+            yield np.array(image)
+
+    def cached_frames():
+        renderer = TextRenderer()
+        while True:
+            frame = background.copy()
+            renderer.draw(frame, (WIDTH//2 - 300, 50), TITLE, font)
+            y_offset = 150
+            for line in LINES:
+                renderer.draw(frame, (WIDTH//2 - 200, y_offset), line, font)
+                y_offset += 50
+            yield frame
+
+    pil = measure_fps(pil_frames(), count)
+    cached = measure_fps(cached_frames(), count)
+    print(f"  Font: {font_id(font)}")
+    print(f"  PIL draw.text: {pil:10.1f} fps")
+    print(f"  Cached masks:  {cached:10.1f} fps")
+    print(f"  Speedup:       {cached / pil:10.1f}x")
+
+
+def benchmark_composer(width, height):
+    """Composer with the overlay pre-rendered plus a caption redrawn every frame."""
+    font = load_font(40)
+    composer = FrameComposer(width, height)
+    composer.draw_static(lambda draw: draw_overlay(draw, font, width))
+    box = (0, height - 120, width, 60)
+
+    def caption(index):
+        image = Image.fromarray(composer.base[box[1]:box[1] + box[3]])
+        ImageDraw.Draw(image).text((width//2 - 300, 10), f"Frame {index} - keep going!",
+                                   fill=(255, 255, 255), font=font)
+        return np.array(image)
+
+    composer.add_dynamic_layer(box, caption)
+    return composer
+
+
+def benchmark_parallel(count=300):
+    """Frame throughput of parallel chunked rendering across worker counts."""
+    cpus = os.cpu_count() or 1
+    sweep = sorted({1, 2, 4, cpus})
+    for width, height in ((1280, 720), (1920, 1080)):
+        print(f"🧵 Parallel rendering ({width}x{height}, {count} frames, {cpus} CPUs)")
+        baseline = None
+        for workers in sweep:
+            frames = iter_frames_parallel(partial(benchmark_composer, width, height), count,
+                                          (width, height), workers)
+            fps = measure_fps(frames, count)
+            frames.close()
+            baseline = baseline or fps
+            print(f"  {workers:2d} worker(s) {fps:10.1f} fps {fps / baseline:6.2f}x")
+
+
+def benchmark_timeline(seconds=15, fps=30):
+    """Encode a still reminder as every frame versus one held keyframe."""
+    print(f"🖼️  Still video encode ({WIDTH}x{HEIGHT}, {seconds}s at {fps} fps)")
+    frame = next(composer_frames(1)).copy()
+    with tempfile.TemporaryDirectory() as tmp:
+        every_path = os.path.join(tmp, 'every_frame.mp4')
+        start = time.perf_counter()
+        encode_with_ffmpeg((frame for _ in range(seconds * fps)), every_path, fps, (WIDTH, HEIGHT))
+        every = time.perf_counter() - start
+
+        held_path = os.path.join(tmp, 'held.mp4')
+        timeline = Timeline(fps)
+        timeline.add_still(frame, seconds)
+        start = time.perf_counter()
+        timeline.encode(held_path)
+        held = time.perf_counter() - start
+
+        print(f"  Every frame: {every:8.2f} s {os.path.getsize(every_path) / 1024:8.1f} KB")
+        print(f"  Held still:  {held:8.2f} s {os.path.getsize(held_path) / 1024:8.1f} KB")
+        print(f"  Speedup:     {every / held:8.1f}x {os.path.getsize(every_path) / os.path.getsize(held_path):8.1f}x smaller")
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def encode_buffered(video_path, count):
+    """Old path: collect every frame in a list, then write them all."""
+    frames = [legacy_render_frame() for _ in range(count)]
+    write_frames(frames, video_path, 30, (WIDTH, HEIGHT))
+
+
+def encode_streamed(video_path, count):
+    """New path: yield frames from the composer straight into the writer."""
+    font = load_font(40)
+    composer = FrameComposer(WIDTH, HEIGHT)
+    composer.draw_static(lambda draw: draw_overlay(draw, font))
+    write_frames(iter_frames(composer, count), video_path, 30, (WIDTH, HEIGHT))
+
+
+def _run_encode(encode, count, results):
+    with tempfile.TemporaryDirectory() as tmp:
+        encode(os.path.join(tmp, 'bench.mp4'), count)
+    results.put(peak_rss_mb())
+
+
+def measure_peak_rss(encode, count):
+    """Run an encode path in a fresh process and return its peak RSS in MB."""
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_run_encode, args=(encode, count, results))
+    worker.start()
+    peak = results.get()
+    worker.join()
+    return peak
+
+
+def benchmark_memory(count=450):
+    """Report peak RSS of the buffered and streamed encode paths."""
+    print(f"🧠 Peak memory ({WIDTH}x{HEIGHT}, {count} frames)")
+    buffered = measure_peak_rss(encode_buffered, count)
+    streamed = measure_peak_rss(encode_streamed, count)
+    if buffered is None or streamed is None:
+        print("  Peak RSS is not available on this platform")
+        return
+    print(f"  Buffered: {buffered:10.1f} MB")
+    print(f"  Streamed: {streamed:10.1f} MB")
+
+
+# Code each bot entry point runs before doing real work (no email is sent)
+IMPORT_PATHS = {
+    # python tesphase_girlfriend_bot.py test
+    'test': "import tesphase_girlfriend_bot as m; m.TesphaseGirlfriendBot()",
+    # scheduler start-up and the 08:00 / 14:00 reminders
+    'morning': "import tesphase_girlfriend_bot as m; b = m.TesphaseGirlfriendBot(); "
+               "from event_scheduler import EventScheduler; EventScheduler()",
+    # the evening pre-render worker, which needs the media stack and TTS but not the bot
+    'evening': "import daily_video as d; v = d.DailyVideo('', '', [], ''); "
+               "import video_renderer, moviepy.editor; v.narrator.start()",
+    # what every path paid when everything was imported and TTS started eagerly
+    'eager (old)': "import cv2, numpy, PIL.Image, pyttsx3, moviepy.editor; pyttsx3.init(); "
+                   "import tesphase_girlfriend_bot as m; m.TesphaseGirlfriendBot()",
+}
+
+
+def measure_imports(code):
+    """Run code under -X importtime; return (import ms, wall ms, module count)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total_us, modules = 0, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules += 1
+        # Top-level imports are not indented; their cumulative time covers the nested ones
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+    return total_us / 1000, wall, modules
+
+
+def benchmark_imports():
+    """Report import time (-X importtime) for the test, morning and evening paths."""
+    print("📦 Start-up imports (-X importtime)")
+    for name, code in IMPORT_PATHS.items():
+        try:
+            imports, wall, modules = measure_imports(code)
+        except RuntimeError as e:
+            print(f"  {name:12} failed: {e}")
+            continue
+        print(f"  {name:12} {imports:8.1f} ms imports {wall:8.1f} ms wall {modules:5d} modules")
+
+
+def write_task_csv(path, count):
+    """Write a synthetic time-tracking export with `count` tasks."""
+    categories = ['solar_research', 'innovation', 'market_research', 'partnerships', 'funding', 'product_dev']
+    with open(path, 'w') as f:
+        f.write("date,category,description,hours,completed\n")
+        for i in range(count):
+            day = f"{2020 + i // 360000}-{(i // 30000) % 12 + 1:02d}-{(i // 1000) % 28 + 1:02d}"
+            f.write(f"{day},{categories[i % len(categories)]},Task {i},{(i % 8) * 0.5},{i % 3 == 0}\n")
+
+
+def _run_task_io(backend, csv_path, results):
+    directory = os.path.dirname(csv_path)
+    if backend == 'sqlite':
+        store = SQLiteStore(os.path.join(directory, 'bench.db'))
+    else:
+        store = JournalStore(os.path.join(directory, 'bench.json'), sync=False)
+        store.load()
+    start = time.perf_counter()
+    imported, _ = import_tasks(store, csv_path)
+    import_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    export_tasks(store, os.path.join(directory, f"export_{backend}.jsonl"))
+    export_seconds = time.perf_counter() - start
+    store.close()
+    results.put((imported, import_seconds, export_seconds, peak_rss_mb()))
+
+
+def benchmark_tasks(count=1_000_000):
+    """Bulk import and export throughput of each task storage backend."""
+    print(f"🗂️  Task import/export ({count:,} tasks)")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'tasks.csv')
+        write_task_csv(csv_path, count)
+        for backend in ('json', 'sqlite'):
+            results = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_run_task_io, args=(backend, csv_path, results))
+            worker.start()
+            imported, import_seconds, export_seconds, peak = results.get()
+            worker.join()
+            peak = f"{peak:8.1f} MB peak" if peak is not None else ""
+            print(f"  {backend:6} import {imported / import_seconds:10,.0f} tasks/s "
+                  f"export {imported / export_seconds:10,.0f} tasks/s {peak}")
+
+
+BENCHMARKS = {
+    'render': benchmark_render,
+    'text': benchmark_text,
+    'parallel': benchmark_parallel,
+    'timeline': benchmark_timeline,
+    'memory': benchmark_memory,
+    'imports': benchmark_imports,
+    'tasks': benchmark_tasks,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            continue
+        BENCHMARKS[name]()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Tesphase Daily Video
+Renders, narrates and caches the evening video and fits it into the email
+attachment budget.
+
+Everything the video depends on (the script, the overlay text and the video
+settings) is passed in as plain values, so the pre-render worker process
+builds only this, not the bot with its email queue and task store.
+"""
+
+import logging
+import os
+import shutil
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from narration import NarrationWorker
+from prerender import check_cancelled
+from render_cache import RenderCache
+
+# Media libraries (OpenCV, NumPy, PIL, moviepy) are imported where they are used
+
+
+class DailyVideo:
+    """One day's video, rendered from its script, overlay text and settings."""
+
+    def __init__(self, script: str, title: str, lines: List[str], progress: str,
+                 width: int = 1280, height: int = 720, fps: int = 30, duration: int = 15,
+                 pipeline: str = 'single_pass', render_workers: int = 1,
+                 attachment_budget: int = 10 * 1024 * 1024, video_base_url: str = '',
+                 cache_dir: str = 'cache', cache_max_bytes: int = 500 * 1024 * 1024,
+                 tts_rate: int = 150, tts_volume: float = 0.9):
+        self.script = script
+        self.title = title
+        self.lines = lines
+        self.progress = progress
+        # "single_pass" encodes frames and narration in one ffmpeg run,
+        # "two_pass" uses OpenCV mp4v followed by a moviepy re-encode
+        self.video_width, self.video_height = width, height
+        self.video_fps = fps
+        self.video_duration = duration  # seconds
+        self.video_pipeline = pipeline
+        # Worker processes rendering frame chunks in parallel (1 renders inline)
+        self.video_render_workers = render_workers
+        # The video is re-encoded to fit this attachment size (after base64);
+        # past it a thumbnail is sent, linking video_base_url if set
+        self.attachment_budget = attachment_budget
+        self.video_base_url = video_base_url
+
+        # Content-addressed cache for videos, narration and pre-rendered layers
+        self.render_cache = RenderCache(cache_dir, cache_max_bytes)
+
+        # Narration is synthesized phrase by phrase on one worker thread that
+        # owns the speech engine; unchanged phrases come from the render cache
+        self.narrator = NarrationWorker(self.render_cache, tts_rate, tts_volume)
+
+    def create_daily_video(self):
+        """Create the daily video, returning its path (None on failure)."""
+        try:
+            # Reuse a previous render when nothing that affects the output changed
+            video_key = self.video_cache_key()
+            final_video_path = f"videos/tesphase_final_{datetime.now().strftime('%Y%m%d')}.mp4"
+            cached_path = self.render_cache.get('video', video_key, '.mp4')
+            if cached_path:
+                shutil.copyfile(cached_path, final_video_path)
+                logging.info(f"Daily video reused from cache: {final_video_path}")
+                return final_video_path
+
+            final_video_path, complete = self.render_daily_video()
+            # Only cache complete renders, not the silent fallback video
+            if complete:
+                self.render_cache.put('video', video_key, final_video_path, '.mp4')
+
+            logging.info(f"Daily video created: {final_video_path}")
+            logging.info(f"Render cache stats: {self.render_cache.stats()}")
+            return final_video_path
+
+        except Exception as e:
+            logging.error(f"Error creating daily video: {e}")
+            return None
+
+    def render_daily_video(self):
+        """Render and encode the daily video.
+
+        Returns (path, complete); complete is False when narration couldn't be
+        added and the path is the silent fallback video.
+        """
+        if self.video_pipeline == 'single_pass':
+            try:
+                return self.create_video_single_pass(), True
+            except Exception as e:
+                logging.error(f"Single-pass encode failed, falling back to two-pass: {e}")
+
+        # Create video with text overlay
+        video_path = self.create_video_with_text()
+
+        # Add audio narration
+        return self.add_audio_narration(video_path)
+
+    def video_cache_key(self):
+        """Hash everything that determines the final video's content."""
+        from text_layer import font_id, load_font
+
+        return self.render_cache.key(
+            self.script, self.title, self.lines, self.progress, self.video_width, self.video_height,
+            self.video_fps, self.video_duration, font_id(load_font(40))
+        )
+
+    def create_video_with_text(self):
+        """Create video with text overlay."""
+        from video_renderer import write_frames
+
+        # Create a simple video with text
+        width, height = self.video_width, self.video_height
+        duration = self.video_duration
+        fps = self.video_fps
+
+        # Stream frames straight into the writer instead of buffering the clip
+        video_path = f"videos/tesphase_reminder_{datetime.now().strftime('%Y%m%d')}.mp4"
+        write_frames(self.video_frames(width, height, duration * fps), video_path, fps, (width, height))
+        return video_path
+
+    def create_video_single_pass(self):
+        """Render the video and narration straight into the final file in one encode."""
+        from video_timeline import Timeline
+
+        width, height = self.video_width, self.video_height
+        audio_path = self.synthesize_narration()
+
+        # The reminder is one still image, so it is rendered and encoded once
+        # and held for the whole clip instead of as duration * fps frames
+        timeline = Timeline(self.video_fps)
+        timeline.add_still(self.create_video_composer(width, height).compose(0), self.video_duration)
+
+        final_path = f"videos/tesphase_final_{datetime.now().strftime('%Y%m%d')}.mp4"
+        return timeline.encode(final_path, audio_path=audio_path)
+
+    def video_frames(self, width: int, height: int, count: int):
+        """Frames for the daily video, rendered inline or by video_render_workers processes."""
+        from video_renderer import iter_frames, iter_frames_parallel
+
+        # Background and text never change between frames, so render them once;
+        # render workers get the overlay text and the cached layer's path
+        build = partial(build_overlay_composer, width, height, self.title, self.lines, self.progress,
+                        self.video_layer(width, height))
+        if self.video_render_workers <= 1:
+            return iter_frames(build(), count)
+        return iter_frames_parallel(build, count, (width, height), self.video_render_workers,
+                                    check_cancel=check_cancelled)
+
+    def create_video_composer(self, width: int, height: int):
+        """Build the frame composer with the gradient and text overlay pre-rendered."""
+        return build_overlay_composer(width, height, self.title, self.lines, self.progress,
+                                      self.video_layer(width, height))
+
+    def video_layer(self, width: int, height: int):
+        """Return the cached gradient-plus-body-text layer (.npy), rendering it if needed."""
+        import numpy as np
+        from text_layer import font_id, load_font
+        from video_renderer import FrameComposer
+
+        # Gradient plus body text is the same every day; only the dated title
+        # and progress line are drawn fresh on top of the cached layer
+        font = load_font(40)
+        layer_key = self.render_cache.key(self.lines, width, height, font_id(font))
+        cached_layer = self.render_cache.get('layer', layer_key, '.npy')
+        if cached_layer:
+            return cached_layer
+
+        composer = FrameComposer(width, height)
+        draw_body_text(composer, self.lines, font)
+        layer_path = f"images/layer_{layer_key}.npy"
+        np.save(layer_path, composer.base)
+        cached_layer = self.render_cache.put('layer', layer_key, layer_path, '.npy')
+        os.remove(layer_path)
+        return cached_layer
+
+    def synthesize_narration(self):
+        """Synthesize the narration audio for the script and return its path (None if silent)."""
+        audio_path = f"audio/narration_{datetime.now().strftime('%Y%m%d')}.wav"
+
+        # Only phrases not already in the cache are sent to the speech engine
+        return self.narrator.narrate(self.script, audio_path)
+
+    def add_audio_narration(self, video_path: str):
+        """Add audio narration to video, returning (path, complete) like render_daily_video."""
+        from moviepy.editor import VideoFileClip, AudioFileClip
+
+        try:
+            # Generate audio from script
+            audio_path = self.synthesize_narration()
+            if audio_path is None:
+                # Nothing to narrate: the silent video is the whole render
+                return video_path, True
+
+            # Combine video and audio
+            video_clip = VideoFileClip(video_path)
+            audio_clip = AudioFileClip(audio_path)
+
+            # Ensure audio matches video duration
+            if audio_clip.duration > video_clip.duration:
+                audio_clip = audio_clip.subclip(0, video_clip.duration)
+
+            final_video = video_clip.set_audio(audio_clip)
+            final_path = f"videos/tesphase_final_{datetime.now().strftime('%Y%m%d')}.mp4"
+            final_video.write_videofile(final_path, codec='libx264')
+
+            # Clean up
+            video_clip.close()
+            audio_clip.close()
+            final_video.close()
+
+            return final_path, True
+
+        except Exception as e:
+            logging.error(f"Error adding audio narration: {e}")
+            return video_path, False
+
+    def prerender_evening_video(self):
+        """Render the video and fit it to the attachment budget (runs in the pre-render worker).
+
+        Returns (attachment path, summary HTML), or None if no video was made.
+        """
+        video_path = self.create_daily_video()
+        if not video_path:
+            return None
+        return self.prepare_video_attachment(video_path)
+
+    def prepare_video_attachment(self, video_path: str):
+        """Return (attachment path, summary HTML) for the evening video within the size budget."""
+        from video_profiles import fit_video, make_thumbnail
+
+        attached = "I've created a daily video reminder for you! Check the attachment for your personalized Tesphase motivation video."
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        email_path = f"videos/{name}_email.mp4"
+        thumbnail_path = f"images/{name}_preview.jpg"
+        try:
+            # Re-encodes and previews are cached by the video's content and the budget
+            key = self.render_cache.key(self.render_cache.file_digest(video_path), self.attachment_budget)
+            cached_path = self.render_cache.get('attachment', key, '.mp4')
+            if cached_path:
+                shutil.copyfile(cached_path, email_path)
+                return email_path, attached
+            cached_path = self.render_cache.get('preview', key, '.jpg')
+            if cached_path:
+                shutil.copyfile(cached_path, thumbnail_path)
+            else:
+                fitted = fit_video(video_path, self.attachment_budget)
+                if fitted and fitted[0] == video_path:
+                    return video_path, attached
+                if fitted:
+                    os.replace(fitted[0], email_path)
+                    self.render_cache.put('attachment', key, email_path, '.mp4')
+                    return email_path, attached
+
+                # Nothing fits: send a preview, and a link if the videos folder is served
+                make_thumbnail(video_path, thumbnail_path)
+                self.render_cache.put('preview', key, thumbnail_path, '.jpg')
+        except Exception as e:
+            logging.error(f"Error fitting video attachment, attaching it as is: {e}")
+            return video_path, attached
+
+        logging.info(f"Video too large for a {self.attachment_budget / (1024 * 1024):g} MB attachment; sending a preview")
+        summary = "Today's video reminder was too big to attach, so here's a preview of it!"
+        if self.video_base_url:
+            url = f"{self.video_base_url.rstrip('/')}/{os.path.basename(video_path)}"
+            summary += f' <a href="{url}" style="color: #2E8B57;">Watch the full video</a>.'
+        return thumbnail_path, summary
+
+
+def prerender_daily_video(inputs: Dict[str, Any]):
+    """Render and fit today's video from DailyVideo arguments (the VideoPrerenderer target)."""
+    return DailyVideo(**inputs).prerender_evening_video()
+
+
+def draw_body_text(composer, lines: List[str], font):
+    """Draw the video's body text lines into the composer's base layer."""
+    y_offset = 150
+    for line in lines:
+        composer.draw_text((composer.width//2 - 200, y_offset), line, font)
+        y_offset += 50
+
+
+def build_overlay_composer(width: int, height: int, title: str, lines: List[str], progress: str,
+                           layer_path: Optional[str] = None):
+    """Build the daily video's frame composer from its overlay text alone.
+
+    Render worker processes (see iter_frames_parallel) call it cheaply. The
+    body text is loaded from `layer_path` when that pre-rendered layer still
+    exists, and drawn otherwise.
+    """
+    import numpy as np
+    from text_layer import load_font
+    from video_renderer import FrameComposer
+
+    font = load_font(40)
+    if layer_path and os.path.exists(layer_path):
+        composer = FrameComposer(width, height, background=np.load(layer_path))
+    else:
+        composer = FrameComposer(width, height)
+        draw_body_text(composer, lines, font)
+
+    composer.draw_text((width//2 - 300, 50), title, font)
+    composer.draw_text((width//2 - 300, height - 80), progress, font)
+    return composer
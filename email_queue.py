@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Tesphase Email Queue
+Outbound delivery queue persisted to disk. Scheduled jobs enqueue a message
+and return immediately; worker threads deliver it through the shared SMTP
+pool, retrying transient failures with exponential backoff and moving
+messages that can't be delivered to a dead-letter folder.
+
+A batch (one message fanned out to many recipients) stores the message once;
+each recipient's job references that shared file and only adds its own To
+header at send time. Messages are streamed from disk to the SMTP server, so
+large attachments are never loaded into memory.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Union
+
+from smtp_pool import get_pool
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """Return True for errors that retrying won't fix (rejected recipients, 5xx replies)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class RateLimiter:
+    """Token bucket shared by all workers to cap messages per second."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a send is allowed; a rate of 0 means unlimited."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmailQueue:
+    """Disk-backed outbound email queue with retrying worker threads."""
+
+    def __init__(self, sender: str, password: str, queue_dir: str = 'outbox', workers: int = 2,
+                 max_attempts: int = 5, base_delay: float = 30, max_delay: float = 3600,
+                 rate_per_second: float = 0):
+        self.sender = sender
+        self.password = password
+        self.pending_dir = os.path.join(queue_dir, 'pending')
+        self.dead_dir = os.path.join(queue_dir, 'dead')
+        self.drafts_dir = os.path.join(queue_dir, 'drafts')
+        self.parts_dir = os.path.join(queue_dir, 'parts')
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = RateLimiter(rate_per_second, burst=workers)
+
+        self.heap = []
+        # Shared message file -> number of jobs still using it
+        self.message_refs = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.threads: List[threading.Thread] = []
+        self.running = False
+        # When an idle worker next sends NOOP on the pooled SMTP sessions
+        self.next_ping = 0.0
+
+        for directory in (self.pending_dir, self.dead_dir, self.drafts_dir, self.parts_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def _job_paths(self, job_id: str, directory: str = None):
+        directory = directory or self.pending_dir
+        return os.path.join(directory, f"{job_id}.json"), os.path.join(directory, f"{job_id}.eml")
+
+    def _message_path(self, job: dict) -> str:
+        return os.path.join(self.pending_dir, job.get('message_file', f"{job['id']}.eml"))
+
+    def draft_path(self) -> str:
+        """A fresh path where a caller can build a message file before queueing it."""
+        return os.path.join(self.drafts_dir, f"{uuid.uuid4().hex}.eml")
+
+    def _release_message(self, job: dict):
+        """Drop a job's reference to its message file, deleting it when unused."""
+        message_file = job.get('message_file', f"{job['id']}.eml")
+        with self.condition:
+            remaining = self.message_refs.get(message_file, 1) - 1
+            if remaining > 0:
+                self.message_refs[message_file] = remaining
+                return
+            self.message_refs.pop(message_file, None)
+        try:
+            os.remove(os.path.join(self.pending_dir, message_file))
+        except OSError:
+            pass
+
+    def _new_job(self, recipients: List[str], subject: str, message_file: str = None,
+                 to_header: str = None) -> dict:
+        job_id = uuid.uuid4().hex
+        return {
+            'id': job_id,
+            'to': recipients,
+            'subject': subject,
+            'message_file': message_file or f"{job_id}.eml",
+            'to_header': to_header,
+            'attempts': 0,
+            'next_attempt': time.time(),
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'last_error': None
+        }
+
+    def _save_job(self, job: dict):
+        """Atomically write a job's metadata next to its message file."""
+        meta_path, _ = self._job_paths(job['id'])
+        temp_path = f"{meta_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(job, f, indent=2)
+        os.replace(temp_path, meta_path)
+
+    def _push(self, job: dict):
+        heapq.heappush(self.heap, (job['next_attempt'], next(self.sequence), job))
+        self.condition.notify()
+
+    def start(self):
+        """Load pending jobs left from a previous run and start the workers."""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            recovered = 0
+            for name in os.listdir(self.pending_dir):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.pending_dir, name), 'r') as f:
+                        job = json.load(f)
+                    message_file = job.get('message_file', f"{job['id']}.eml")
+                    self.message_refs[message_file] = self.message_refs.get(message_file, 0) + 1
+                    self._push(job)
+                    recovered += 1
+                except Exception as e:
+                    logging.error(f"Error loading queued email {name}: {e}")
+            if recovered:
+                logging.info(f"Recovered {recovered} queued email(s)")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"email-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        """Stop the workers; undelivered jobs stay on disk for the next start."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def enqueue(self, recipients: Union[str, List[str]], message: str, subject: str = '') -> str:
+        """Persist a fully built message for delivery and return its job id."""
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        # Start (and recover old jobs) before persisting, so this job isn't loaded twice
+        self.start()
+        job = self._new_job(recipients, subject)
+        with open(self._message_path(job), 'w') as f:
+            f.write(message)
+        self._save_job(job)
+
+        with self.condition:
+            self.message_refs[job['message_file']] = 1
+            self._push(job)
+        logging.info(f"Email queued: {subject}")
+        return job['id']
+
+    def enqueue_batch(self, recipients: List[str], message: str = None, subject: str = '',
+                      message_path: str = None) -> List[str]:
+        """Queue one message for many recipients, storing the message only once.
+
+        Pass the message as text or as a prebuilt file (message_path, e.g. from
+        draft_path()), which is moved into the queue. It must not carry a To
+        header; each recipient's job adds its own.
+        """
+        self.start()
+        message_file = f"batch_{uuid.uuid4().hex}.eml"
+        if message_path:
+            shutil.move(message_path, os.path.join(self.pending_dir, message_file))
+        else:
+            with open(os.path.join(self.pending_dir, message_file), 'w') as f:
+                f.write(message)
+
+        jobs = [self._new_job([recipient], subject, message_file, recipient) for recipient in recipients]
+        for job in jobs:
+            self._save_job(job)
+
+        with self.condition:
+            self.message_refs[message_file] = len(jobs)
+            for job in jobs:
+                self._push(job)
+        logging.info(f"Email queued for {len(jobs)} recipient(s): {subject}")
+        return [job['id'] for job in jobs]
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting for delivery or retry."""
+        with self.condition:
+            return len(self.heap)
+
+    def _worker(self):
+        pool = get_pool(self.sender, self.password)
+        while True:
+            job = None
+            with self.condition:
+                while self.running:
+                    now = time.time()
+                    if self.heap and self.heap[0][0] <= now:
+                        _, _, job = heapq.heappop(self.heap)
+                        break
+                    if now >= self.next_ping:
+                        # Nothing is due: this worker keeps the pooled sessions alive
+                        self.next_ping = now + max(pool.keepalive, 1)
+                        break
+                    wake = min(self.heap[0][0], self.next_ping) if self.heap else self.next_ping
+                    self.condition.wait(wake - now)
+                if not self.running:
+                    return
+            if job:
+                self._deliver(job)
+            else:
+                pool.ping_idle()
+
+    def _deliver(self, job: dict):
+        """Attempt one delivery, then remove, reschedule or dead-letter the job."""
+        meta_path, _ = self._job_paths(job['id'])
+        try:
+            self.rate_limiter.acquire()
+            get_pool(self.sender, self.password).send_file(
+                self.sender, job['to'], self._message_path(job), job.get('to_header')
+            )
+        except Exception as e:
+            job['attempts'] += 1
+            job['last_error'] = str(e)
+            if is_permanent_failure(e) or job['attempts'] >= self.max_attempts:
+                self._dead_letter(job)
+                return
+            delay = min(self.max_delay, self.base_delay * 2 ** (job['attempts'] - 1))
+            delay *= random.uniform(0.8, 1.2)
+            job['next_attempt'] = time.time() + delay
+            self._save_job(job)
+            logging.info(f"Email '{job['subject']}' to {', '.join(job['to'])} failed ({e}); retry {job['attempts']} in {delay:.0f}s")
+            with self.condition:
+                self._push(job)
+            return
+
+        try:
+            os.remove(meta_path)
+        except OSError:
+            pass
+        self._release_message(job)
+        logging.info(f"Email sent successfully: {job['subject']} ({', '.join(job['to'])})")
+
+    def _dead_letter(self, job: dict):
+        """Move an undeliverable job, with its own copy of the message, to the dead-letter folder."""
+        meta_path, _ = self._job_paths(job['id'])
+        dead_meta_path, dead_message_path = self._job_paths(job['id'], self.dead_dir)
+        try:
+            with open(self._message_path(job), 'r') as source, open(dead_message_path, 'w') as target:
+                if job.get('to_header'):
+                    target.write(f"To: {job['to_header']}\n")
+                shutil.copyfileobj(source, target)
+        except OSError as e:
+            logging.error(f"Error copying dead-letter message {job['id']}: {e}")
+        self._release_message(job)
+        job['message_file'] = os.path.basename(dead_message_path)
+        job['to_header'] = None
+        self._save_job(job)
+        os.replace(meta_path, dead_meta_path)
+        logging.error(f"Email '{job['subject']}' to {', '.join(job['to'])} moved to dead letters after {job['attempts']} attempt(s): {job['last_error']}")
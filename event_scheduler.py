@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Tesphase Event Scheduler
+Daily job scheduler that sleeps until the next due job on a heap of
+deadlines instead of polling every minute. It wakes immediately when stopped
+or when a job is rescheduled, and records how late each job started.
+Watched files (config.env) are checked for changes whenever the loop wakes,
+at least every poll interval, so edits are picked up on every platform.
+Other threads and signal handlers hand work to the loop with call_soon()
+instead of touching the schedule themselves.
+
+Due jobs are dispatched to a bounded thread pool, so a slow job never delays
+the others. Each job has a concurrency limit (a run that is still going when
+the job comes due again is skipped rather than overlapped) and an optional
+stall warning: a run still going after `stall_after` seconds is logged and
+counted. Threads can't be killed, so a stalled run keeps its slot until it
+returns; long renders run in their own process (see VideoPrerenderer), which
+is terminated at its deadline.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+
+def next_daily_run(at: str, after: datetime) -> datetime:
+    """Return the first HH:MM time strictly after `after`."""
+    hour, minute = map(int, at.split(':'))
+    due = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if due <= after:
+        due += timedelta(days=1)
+    return due
+
+
+class EventScheduler:
+    """Runs named daily jobs at fixed HH:MM times."""
+
+    def __init__(self, max_workers: int = 4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scheduled-job')
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.heap = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        self.watches = []
+        self.calls = []
+
+    def every_day_at(self, at: str, job: Callable[[], Any], name: Optional[str] = None,
+                     max_instances: int = 1, stall_after: Optional[float] = None):
+        """Register `job` to run every day at `at` (HH:MM).
+
+        At most `max_instances` runs of the job execute at once; runs still
+        going after `stall_after` seconds are reported as stalled.
+        """
+        name = name or job.__name__
+        with self.condition:
+            self.jobs[name] = {
+                'name': name,
+                'at': at,
+                'job': job,
+                'due': None,
+                'token': None,
+                'max_instances': max_instances,
+                'stall_after': stall_after,
+                'running': 0,
+                'runs': 0,
+                'skipped': 0,
+                'failures': 0,
+                'stalls': 0,
+                'last_lateness': None,
+                'max_lateness': 0.0,
+                'total_lateness': 0.0
+            }
+            self._schedule(self.jobs[name], datetime.now())
+        return name
+
+    def _schedule(self, entry: Dict[str, Any], after: datetime):
+        entry['due'] = next_daily_run(entry['at'], after)
+        entry['token'] = next(self.sequence)
+        heapq.heappush(self.heap, (entry['due'], entry['token'], entry['name']))
+        self.condition.notify_all()
+
+    def reschedule(self, name: str, at: str):
+        """Move a job to a new time of day and wake the loop to pick it up."""
+        with self.condition:
+            entry = self.jobs[name]
+            if entry['at'] == at:
+                return
+            entry['at'] = at
+            # The old heap entry is now stale and is skipped when popped
+            self._schedule(entry, datetime.now())
+        logging.info(f"Rescheduled {name} to {at}")
+
+    def watch_file(self, path: str, callback: Callable[[], Any], interval: float = 30):
+        """Call `callback` when `path`'s modification time changes, checking every `interval` seconds."""
+        with self.condition:
+            self.watches.append({
+                'path': path,
+                'callback': callback,
+                'interval': interval,
+                'mtime': self._mtime(path),
+                'next_check': time.monotonic() + interval
+            })
+            self.condition.notify_all()
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _changed_watches(self):
+        """Watches whose file changed since the last check, plus seconds until the next check."""
+        now = time.monotonic()
+        changed = []
+        for watch in self.watches:
+            if now >= watch['next_check']:
+                watch['next_check'] = now + watch['interval']
+                mtime = self._mtime(watch['path'])
+                if mtime != watch['mtime']:
+                    watch['mtime'] = mtime
+                    changed.append(watch)
+        wait = min((watch['next_check'] - now for watch in self.watches), default=None)
+        return changed, wait
+
+    def call_soon(self, callback: Callable[[], Any]):
+        """Run `callback` on the scheduler loop, waking it if it sleeps.
+
+        Safe to call from a signal handler: it only queues the callback, and
+        the loop runs it outside the lock, never in the middle of a heap update.
+        """
+        with self.condition:
+            self.calls.append(callback)
+            self.condition.notify_all()
+
+    def next_run(self) -> Optional[datetime]:
+        """When the next job is due, or None if nothing is scheduled."""
+        with self.condition:
+            return min((entry['due'] for entry in self.jobs.values()), default=None)
+
+    def _next_due_job(self) -> Optional[Dict[str, Any]]:
+        """Block until a job is due and return it, or None once stopped.
+
+        Callbacks queued with call_soon() and those of changed watched files
+        run here, outside the lock.
+        """
+        while True:
+            with self.condition:
+                if not self.running:
+                    return None
+                calls, self.calls = self.calls, []
+                changed, watch_wait = self._changed_watches()
+                if not calls and not changed:
+                    entry, delay = self._pop_due()
+                    if entry:
+                        return entry
+                    if delay is None or (watch_wait is not None and watch_wait < delay):
+                        delay = watch_wait
+                    self.condition.wait(delay)
+                    continue
+            for watch in changed:
+                logging.info(f"{watch['path']} changed")
+                calls.append(watch['callback'])
+            for callback in calls:
+                try:
+                    callback()
+                except Exception as e:
+                    logging.error(f"Error in scheduler callback {getattr(callback, '__name__', callback)}: {e}")
+
+    def _pop_due(self):
+        """Pop the job that is due now, or return (None, seconds until the next one)."""
+        while self.heap:
+            due, token, name = self.heap[0]
+            entry = self.jobs.get(name)
+            if entry is None or entry['token'] != token:
+                heapq.heappop(self.heap)
+                continue
+            delay = (due - datetime.now()).total_seconds()
+            if delay > 0:
+                return None, delay
+            heapq.heappop(self.heap)
+            self._record_lateness(entry, -delay)
+            self._schedule(entry, max(due, datetime.now()))
+            return entry, None
+        return None, None
+
+    def _record_lateness(self, entry: Dict[str, Any], lateness: float):
+        entry['runs'] += 1
+        entry['last_lateness'] = lateness
+        entry['max_lateness'] = max(entry['max_lateness'], lateness)
+        entry['total_lateness'] += lateness
+
+    def _dispatch(self, entry: Dict[str, Any]):
+        """Hand a due job to the executor unless it is already at its concurrency limit."""
+        with self.condition:
+            if entry['running'] >= entry['max_instances']:
+                entry['skipped'] += 1
+                logging.error(f"Skipping {entry['name']}: previous run still in progress")
+                return
+            entry['running'] += 1
+
+        timer = None
+        if entry['stall_after']:
+            timer = threading.Timer(entry['stall_after'], self._on_stall, args=(entry,))
+            timer.daemon = True
+            timer.start()
+
+        def finished(_future):
+            if timer:
+                timer.cancel()
+            with self.condition:
+                entry['running'] -= 1
+
+        self.executor.submit(self._run_job, entry).add_done_callback(finished)
+
+    def _on_stall(self, entry: Dict[str, Any]):
+        with self.condition:
+            entry['stalls'] += 1
+        logging.error(f"Scheduled job {entry['name']} has been running for more than {entry['stall_after']:g}s")
+
+    def _run_job(self, entry: Dict[str, Any]):
+        """Run one job, logging (not raising) its errors."""
+        logging.info(f"Running {entry['name']} ({entry['last_lateness']:.3f}s late)")
+        try:
+            entry['job']()
+        except Exception as e:
+            with self.condition:
+                entry['failures'] += 1
+            logging.error(f"Error in scheduled job {entry['name']}: {e}")
+
+    def run(self):
+        """Run jobs as they come due until stop() is called."""
+        with self.condition:
+            self.running = True
+        while True:
+            entry = self._next_due_job()
+            if entry is None:
+                return
+            self._dispatch(entry)
+
+    def stop(self, wait: bool = False):
+        """Stop the loop; a sleeping run() returns immediately.
+
+        Jobs not yet started are dropped; jobs already running finish in their
+        worker threads. Pass wait=True to block until they have.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-job run/skip/failure/stall counts and start lateness in seconds."""
+        with self.condition:
+            return {
+                name: {
+                    'at': entry['at'],
+                    'next_run': entry['due'],
+                    'runs': entry['runs'],
+                    'running': entry['running'],
+                    'skipped': entry['skipped'],
+                    'failures': entry['failures'],
+                    'stalls': entry['stalls'],
+                    'last_lateness': entry['last_lateness'],
+                    'max_lateness': entry['max_lateness'],
+                    'avg_lateness': entry['total_lateness'] / entry['runs'] if entry['runs'] else None
+                }
+                for name, entry in self.jobs.items()
+            }
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tesphase MIME Builder
+Builds reminder emails straight to disk. Attachments are base64-encoded in
+chunks into a reusable part file, so a large video is read and encoded once
+and then shared by every message (and every recipient) that attaches it.
+"""
+
+import base64
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from email.header import Header
+from email.mime.text import MIMEText
+
+# 57 raw bytes encode to one 76-character base64 line
+ENCODE_CHUNK_SIZE = 57 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def encode_attachment(attachment_path: str, parts_dir: str, max_age_days: float = 7) -> str:
+    """Return the path of the base64-encoded copy of an attachment, encoding it if needed.
+
+    Parts are keyed on the file's path, size and modification time; parts not
+    used for max_age_days are removed.
+    """
+    os.makedirs(parts_dir, exist_ok=True)
+    stat = os.stat(attachment_path)
+    key = hashlib.sha256(f"{os.path.abspath(attachment_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    part_path = os.path.join(parts_dir, f"{key}.b64")
+
+    if os.path.exists(part_path):
+        os.utime(part_path, None)
+        return part_path
+
+    temp_path = f"{part_path}.{uuid.uuid4().hex}.tmp"
+    with open(attachment_path, 'rb') as source, open(temp_path, 'wb') as target:
+        while True:
+            chunk = source.read(ENCODE_CHUNK_SIZE)
+            if not chunk:
+                break
+            target.write(base64.encodebytes(chunk))
+    os.replace(temp_path, part_path)
+
+    cutoff = time.time() - max_age_days * 86400
+    for name in os.listdir(parts_dir):
+        path = os.path.join(parts_dir, name)
+        if name.endswith('.b64') and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+    return part_path
+
+
+def write_message(output_path: str, sender: str, subject: str, html: str,
+                  attachment_path: str = None, parts_dir: str = 'outbox/parts') -> str:
+    """Write a multipart/mixed email (without a To header) to output_path."""
+    boundary = f"==============={uuid.uuid4().hex}=="
+    body = MIMEText(html, 'html')
+
+    with open(output_path, 'w', encoding='ascii') as f:
+        f.write(f'Content-Type: multipart/mixed; boundary="{boundary}"\n')
+        f.write("MIME-Version: 1.0\n")
+        f.write(f"From: {sender}\n")
+        f.write(f"Subject: {Header(subject, 'utf-8').encode()}\n")
+        f.write(f"\n--{boundary}\n")
+        f.write(body.as_string())
+        f.write("\n")
+
+        if attachment_path and os.path.exists(attachment_path):
+            part_path = encode_attachment(attachment_path, parts_dir)
+            f.write(f"--{boundary}\n")
+            f.write("Content-Type: application/octet-stream\n")
+            f.write("MIME-Version: 1.0\n")
+            f.write("Content-Transfer-Encoding: base64\n")
+            f.write(f"Content-Disposition: attachment; filename= {os.path.basename(attachment_path)}\n\n")
+            f.flush()
+            with open(part_path, 'r', encoding='ascii') as part:
+                shutil.copyfileobj(part, f, COPY_CHUNK_SIZE)
+
+        f.write(f"--{boundary}--\n")
+    return output_path
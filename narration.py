@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Tesphase Narration
+Text-to-speech for the daily video, synthesized phrase by phrase.
+
+Scripts are split into sentences and each phrase's audio is cached on disk
+under a hash of its text and voice settings. From one day to the next only
+the phrases that changed (the date, today's progress) go to the speech
+engine. The cached segments are then concatenated by copying their PCM
+frames, with no re-encoding.
+
+pyttsx3 engines must be driven from the thread that created them, so one
+dedicated worker thread owns the engine and synthesizes every batch of new
+phrases with a single runAndWait().
+"""
+
+import logging
+import os
+import queue
+import re
+import subprocess
+import threading
+import uuid
+import wave
+from concurrent.futures import Future
+from typing import List, Optional
+
+from render_cache import RenderCache
+
+PHRASE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+SPEAKABLE = re.compile(r'\w')
+COPY_FRAMES = 64 * 1024
+
+
+def split_phrases(script: str) -> List[str]:
+    """Split a script into sentences to speak.
+
+    Blank lines, bullet markers and phrases with nothing to say (a lone
+    emoji) are dropped.
+    """
+    phrases = []
+    for line in script.splitlines():
+        line = line.strip().lstrip('•-*').strip()
+        if line:
+            phrases.extend(phrase for phrase in PHRASE_BOUNDARY.split(line) if SPEAKABLE.search(phrase))
+    return phrases
+
+
+def concat_wav(segment_paths: List[str], output_path: str, pause: float = 0.0) -> str:
+    """Join WAV segments by copying their frames, with `pause` seconds of silence between them.
+
+    All segments must share channels, sample width and rate, which holds for
+    audio from the same engine and voice; otherwise, or if there are no
+    segments, ValueError is raised.
+    """
+    if not segment_paths:
+        raise ValueError("No audio segments to join")
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    with wave.open(segment_paths[0], 'rb') as first:
+        params = first.getparams()
+    silence_byte = b'\x80' if params.sampwidth == 1 else b'\x00'
+    silence = silence_byte * (int(params.framerate * pause) * params.nchannels * params.sampwidth)
+
+    try:
+        with wave.open(temp_path, 'wb') as output:
+            output.setnchannels(params.nchannels)
+            output.setsampwidth(params.sampwidth)
+            output.setframerate(params.framerate)
+            for index, path in enumerate(segment_paths):
+                with wave.open(path, 'rb') as segment:
+                    if (segment.getnchannels(), segment.getsampwidth(), segment.getframerate()) != \
+                            (params.nchannels, params.sampwidth, params.framerate):
+                        raise ValueError(f"{path} has a different audio format")
+                    if index and silence:
+                        output.writeframes(silence)
+                    while True:
+                        frames = segment.readframes(COPY_FRAMES)
+                        if not frames:
+                            break
+                        output.writeframes(frames)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return output_path
+
+
+def concat_with_ffmpeg(segment_paths: List[str], output_path: str) -> str:
+    """Join segments the engine didn't write as WAV (e.g. AIFF on macOS) with ffmpeg's concat demuxer."""
+    from video_renderer import find_ffmpeg
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found; set FFMPEG_BINARY or install imageio-ffmpeg")
+    list_path = f"{output_path}.{uuid.uuid4().hex}.txt"
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    try:
+        # PCM in, PCM out: only the container and byte order change
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                        '-i', list_path, '-c:a', 'pcm_s16le', output_path],
+                       check=True, capture_output=True)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+class NarrationWorker:
+    """Owns the text-to-speech engine and synthesizes uncached phrases on one thread."""
+
+    def __init__(self, cache: RenderCache, rate: int = 150, volume: float = 0.9,
+                 work_dir: str = 'audio', pause: float = 0.15, timeout: float = 300):
+        self.cache = cache
+        self.rate = rate
+        self.volume = volume
+        self.work_dir = work_dir
+        self.pause = pause
+        self.timeout = timeout
+        # ([(text, audio path), ...], Future) batches for the worker; None stops it
+        self.requests = queue.Queue()
+        self.thread = None
+        self.ready = threading.Event()
+        self.start_error = None
+        self.lock = threading.Lock()
+        self.synthesized = 0
+        self.reused = 0
+
+    def _create_engine(self):
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.setProperty('rate', self.rate)
+        engine.setProperty('volume', self.volume)
+        return engine
+
+    def start(self):
+        """Start the worker and wait until its engine is ready (raises if it can't start)."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='tts-worker', daemon=True)
+                self.thread.start()
+        self.ready.wait()
+        if self.start_error:
+            raise RuntimeError(f"Text-to-speech engine failed to start: {self.start_error}")
+
+    def stop(self):
+        """Let the worker finish queued batches and exit."""
+        if self.thread:
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+            self.ready.clear()
+
+    def _run(self):
+        try:
+            engine = self._create_engine()
+        except Exception as e:
+            self.start_error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            phrases, future = request
+            try:
+                for text, path in phrases:
+                    engine.save_to_file(text, path)
+                # One run of the engine's loop renders the whole batch
+                engine.runAndWait()
+                missing = [path for _, path in phrases if not os.path.exists(path)]
+                if missing:
+                    raise RuntimeError(f"engine produced no audio for {len(missing)} phrase(s)")
+                future.set_result([path for _, path in phrases])
+            except Exception as e:
+                future.set_exception(e)
+
+    def phrase_key(self, text: str) -> str:
+        """Cache key for one phrase in the current voice settings."""
+        return self.cache.key('phrase', text, self.rate, self.volume)
+
+    def synthesize(self, phrases: List[str]) -> List[str]:
+        """Return an audio file per phrase, synthesizing only those not already cached."""
+        paths = {}
+        for text in phrases:
+            if text not in paths:
+                paths[text] = self.cache.get('phrase', self.phrase_key(text), '.wav')
+
+        missing = [text for text, path in paths.items() if path is None]
+        self.reused += len(paths) - len(missing)
+        if missing:
+            self.start()
+            os.makedirs(self.work_dir, exist_ok=True)
+            batch = [(text, os.path.join(self.work_dir, f"phrase_{uuid.uuid4().hex}.wav")) for text in missing]
+            future = Future()
+            self.requests.put((batch, future))
+            future.result(timeout=self.timeout)
+            for text, temp_path in batch:
+                paths[text] = self.cache.put('phrase', self.phrase_key(text), temp_path, '.wav')
+                os.remove(temp_path)
+            self.synthesized += len(missing)
+            logging.info(f"Narration: synthesized {len(missing)} new phrase(s), reused {len(paths) - len(missing)}")
+        return [paths[text] for text in phrases]
+
+    def narrate(self, script: str, output_path: str) -> Optional[str]:
+        """Write the narration for a whole script to output_path.
+
+        Returns None, writing nothing, if the script has nothing to speak.
+        """
+        phrases = split_phrases(script)
+        if not phrases:
+            logging.info("Narration: script has no speakable phrases")
+            return None
+        segments = self.synthesize(phrases)
+        try:
+            return concat_wav(segments, output_path, self.pause)
+        except (wave.Error, EOFError, ValueError) as e:
+            logging.info(f"Narration segments aren't plain WAV ({e}); joining with ffmpeg")
+            return concat_with_ffmpeg(segments, output_path)
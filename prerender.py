@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tesphase Video Pre-renderer
+Builds the day's video, and fits it into the attachment budget, in a separate
+worker process ahead of the evening send slot, so the scheduler only has to
+attach a finished file.
+
+The worker is not a daemon process, because daemon processes can't start the
+frame render pool (VIDEO_RENDER_WORKERS) of their own. When the deadline
+passes, or the bot shuts down, the render is cancelled rather than killed: a
+cancel event is set, which the frame renderer checks between chunks, and on
+POSIX SIGTERM raises RenderCancelled wherever the worker is (ffmpeg waits
+included). Either way the render unwinds, shutting down its frame pool,
+releasing shared memory and stopping ffmpeg. Only a worker still running
+after a grace period is killed.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from datetime import datetime
+from typing import Any, Callable
+
+# Set in the worker process to the event the parent sets on cancellation
+_cancel_event = None
+
+
+class RenderCancelled(BaseException):
+    """Raised in the pre-render worker when its render is cancelled.
+
+    A BaseException, like KeyboardInterrupt, so the render's own
+    `except Exception` fallbacks don't swallow it.
+    """
+
+
+def check_cancelled():
+    """Raise RenderCancelled if this pre-render worker has been cancelled; long loops call it."""
+    if _cancel_event is not None and _cancel_event.is_set():
+        raise RenderCancelled()
+
+
+def _on_sigterm(signum, frame):
+    raise RenderCancelled()
+
+
+def _run_target(target: Callable[..., Any], args, results, cancel):
+    """Worker entry point: render and report the result (or None)."""
+    global _cancel_event
+    _cancel_event = cancel
+    if os.name != 'nt':
+        signal.signal(signal.SIGTERM, _on_sigterm)
+    try:
+        results.put(target(*args))
+    except RenderCancelled:
+        logging.error("Video pre-render cancelled")
+    except Exception as e:
+        logging.error(f"Error pre-rendering video: {e}")
+        results.put(None)
+
+
+class VideoPrerenderer:
+    """Runs a picklable render function in a worker process with a deadline."""
+
+    def __init__(self, target: Callable[..., Any], grace: float = 30):
+        self.target = target
+        # Seconds a cancelled render gets to clean up before it is killed
+        self.grace = grace
+        self.process = None
+        self.results = None
+        self.cancel = None
+        self.deadline = None
+
+    def start(self, deadline: datetime, *args):
+        """Start rendering target(*args) in the background; the result must be ready by `deadline`.
+
+        The arguments are pickled into the worker, so pass plain render
+        inputs rather than objects holding files, threads or connections.
+        """
+        if self.process is not None and self.process.is_alive():
+            logging.info("Video pre-render already running")
+            return
+        self.results = multiprocessing.Queue()
+        self.cancel = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_run_target,
+                                               args=(self.target, args, self.results, self.cancel))
+        self.process.start()
+        self.deadline = deadline
+        logging.info(f"Video pre-render started (deadline {deadline.strftime('%H:%M')})")
+
+    def collect(self) -> Any:
+        """Return what the render function returned, or None if it missed its deadline.
+
+        Waits no later than the deadline; a worker still running after that is
+        cancelled so it cannot hold up the next day's render.
+        """
+        if self.process is None:
+            logging.info("No video pre-render was started")
+            return None
+
+        remaining = max(0.0, (self.deadline - datetime.now()).total_seconds())
+        try:
+            result = self.results.get(timeout=remaining) if remaining else self.results.get_nowait()
+        except queue.Empty:
+            result = None
+            if self.process.is_alive():
+                logging.error("Video pre-render missed its deadline; sending without video")
+                self._cancel()
+            else:
+                # The worker exited just now; give its queue a moment to flush
+                try:
+                    result = self.results.get(timeout=1)
+                except queue.Empty:
+                    pass
+
+        self.process.join()
+        self.process = None
+        self.results = None
+        return result
+
+    def _cancel(self):
+        """Ask the worker to unwind its render, killing it only if it doesn't within the grace period."""
+        self.cancel.set()
+        if os.name != 'nt':
+            # Raises RenderCancelled in the worker (see _run_target)
+            self.process.terminate()
+        self.process.join(self.grace)
+        if self.process.is_alive():
+            logging.error("Video pre-render didn't stop after cancelling; killing it")
+            self.process.kill()
+            self.process.join()
+
+    def stop(self):
+        """Cancel a render still in progress and wait for the worker to exit."""
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            logging.info("Stopping video pre-render")
+            self._cancel()
+        self.process.join()
+        self.process = None
+        self.results = None
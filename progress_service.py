@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tesphase Progress Service
+Shared view of today's progress for the task tracker and the bot.
+
+Every change made through the tracker refreshes a small daily digest file
+(today's tasks, completions and hours, plus the running totals and
+milestones) from the store's indexed lookups and running aggregates. The
+bot's evening email and video read that digest, so they get real numbers
+without opening or parsing the task history.
+"""
+
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from task_storage import TaskStore, open_store
+
+
+class ProgressService:
+    """Maintains and serves the precomputed daily progress digest."""
+
+    def __init__(self, store: TaskStore = None, digest_file: str = 'tesphase_digest.json'):
+        self._store = store
+        self.digest_file = digest_file
+
+    @property
+    def store(self) -> TaskStore:
+        """The task store, opened only if the digest has to be rebuilt."""
+        if self._store is None:
+            self._store = open_store()
+        return self._store
+
+    def build_digest(self, day: str = None) -> Dict[str, Any]:
+        """Compute the digest for `day` (default today) from the store."""
+        day = day or date.today().strftime('%Y-%m-%d')
+        today = self.store.day_stats(day)
+        totals = self.store.stats()
+        tasks = self.store.tasks_for_day(day)
+        categories: Dict[str, float] = {}
+        for task in tasks:
+            categories[task['category']] = categories.get(task['category'], 0) + task['hours']
+        return {
+            'date': day,
+            'tasks': today['total'],
+            'completed': today['completed'],
+            'hours': round(today['hours'], 2),
+            'categories': categories,
+            'completed_tasks': [task['description'] for task in tasks if task['completed']],
+            'total_tasks': totals['total'],
+            'total_completed': totals['completed'],
+            'total_hours': round(totals['hours'], 2),
+            'milestones': [{'title': m['title'], 'date': m['date']} for m in self.store.milestones()],
+            'start_date': self.store.start_date(),
+            'updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def refresh(self) -> Dict[str, Any]:
+        """Rebuild today's digest and save it; call after every change to the store."""
+        digest = self.build_digest()
+        temp_path = f"{self.digest_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(digest, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.digest_file)
+        return digest
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """The saved digest, or None if there is none yet."""
+        try:
+            with open(self.digest_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Error reading progress digest: {e}")
+            return None
+
+    def today(self) -> Dict[str, Any]:
+        """Today's digest, read from the saved file.
+
+        If the last change was on an earlier day, today's numbers are zero
+        but the totals still apply; the store is only opened when no digest
+        has been saved yet.
+        """
+        day = date.today().strftime('%Y-%m-%d')
+        digest = self.load()
+        if digest is None:
+            return self.refresh()
+        if digest['date'] != day:
+            digest = dict(digest, date=day, tasks=0, completed=0, hours=0, categories={}, completed_tasks=[])
+        return digest
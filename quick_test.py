@@ -4,10 +4,10 @@ Quick test - send email to sender address to verify delivery
 """
 
 import os
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+from smtp_pool import get_pool
 
 load_dotenv('config.env')
 
@@ -39,13 +39,8 @@ def send_test_to_sender():
         
         msg.attach(MIMEText(body, 'plain'))
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(email_sender, email_password)
-        
         text = msg.as_string()
-        server.sendmail(email_sender, email_sender, text)
-        server.quit()
+        get_pool(email_sender, email_password).sendmail(email_sender, email_sender, text)
         
         print("✅ Self-test email sent!")
         print(f"📧 Check your inbox at: {email_sender}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tesphase Recipient Registry
+The list of people the bot writes to. Stored in recipients.json; when that
+file doesn't exist the single EMAIL_RECIPIENT from config.env is used. The
+file is re-read whenever it changes, so recipients added or removed while the
+bot runs get the next reminder.
+
+Usage: python recipients.py [list | add <email> [name] | remove <email>]
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class RecipientRegistry:
+    """Loads, lists and edits the bot's recipients."""
+
+    def __init__(self, recipients_file: str = 'recipients.json', default_recipient: str = None):
+        self.recipients_file = recipients_file
+        self.default_recipient = default_recipient
+        self.loaded_version: Optional[Tuple[int, int]] = None
+        self.load_recipients()
+
+    def file_version(self) -> Optional[Tuple[int, int]]:
+        """(mtime, size) of the recipients file, or None when it doesn't exist."""
+        try:
+            stat = os.stat(self.recipients_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """Reload the recipients if the file changed since it was last read."""
+        if self.file_version() != self.loaded_version:
+            self.load_recipients()
+            logging.info(f"Recipients reloaded: {len(self.active_emails())} active")
+
+    def load_recipients(self):
+        """Load recipients from file, falling back to the configured default."""
+        self.loaded_version = self.file_version()
+        try:
+            if os.path.exists(self.recipients_file):
+                with open(self.recipients_file, 'r') as f:
+                    self.recipients: List[Dict] = json.load(f)['recipients']
+            elif self.default_recipient:
+                self.recipients = [{'email': self.default_recipient, 'name': '', 'active': True}]
+            else:
+                self.recipients = []
+        except Exception as e:
+            logging.error(f"Error loading recipients: {e}")
+            self.recipients = [{'email': self.default_recipient, 'name': '', 'active': True}] if self.default_recipient else []
+
+    def save_recipients(self):
+        """Save recipients to file."""
+        try:
+            temp_path = f"{self.recipients_file}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'recipients': self.recipients}, f, indent=2)
+            os.replace(temp_path, self.recipients_file)
+            self.loaded_version = self.file_version()
+        except Exception as e:
+            logging.error(f"Error saving recipients: {e}")
+
+    def active(self) -> List[str]:
+        """Email addresses of every active recipient, re-reading the file if it changed."""
+        self.refresh()
+        return self.active_emails()
+
+    def active_emails(self) -> List[str]:
+        return [r['email'] for r in self.recipients if r.get('active', True)]
+
+    def add(self, email: str, name: str = ''):
+        """Add (or reactivate) a recipient."""
+        self.refresh()
+        for recipient in self.recipients:
+            if recipient['email'].lower() == email.lower():
+                recipient['active'] = True
+                break
+        else:
+            self.recipients.append({
+                'email': email,
+                'name': name,
+                'active': True,
+                'added': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+        self.save_recipients()
+
+    def remove(self, email: str) -> bool:
+        """Deactivate a recipient; returns False if they weren't registered."""
+        self.refresh()
+        for recipient in self.recipients:
+            if recipient['email'].lower() == email.lower():
+                recipient['active'] = False
+                self.save_recipients()
+                return True
+        return False
+
+
+def main():
+    """Manage recipients from the command line."""
+    from dotenv import load_dotenv
+    load_dotenv('config.env')
+    registry = RecipientRegistry(os.getenv('RECIPIENTS_FILE', 'recipients.json'), os.getenv('EMAIL_RECIPIENT'))
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if command == 'add' and len(sys.argv) > 2:
+        registry.add(sys.argv[2], ' '.join(sys.argv[3:]))
+        print(f"✅ Recipient added: {sys.argv[2]}")
+    elif command == 'remove' and len(sys.argv) > 2:
+        if registry.remove(sys.argv[2]):
+            print(f"👋 Recipient removed: {sys.argv[2]}")
+        else:
+            print(f"❌ Recipient not found: {sys.argv[2]}")
+    elif command == 'list':
+        active = registry.active()
+        print(f"📬 {len(active)} active recipient(s)")
+        for email in active:
+            print(f"  • {email}")
+    else:
+        print(__doc__.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
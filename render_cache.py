@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tesphase Render Cache
+Content-addressed on-disk cache for rendered videos, narration audio and
+pre-rendered frame layers, with least-recently-used eviction by total size.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+
+class RenderCache:
+    """Stores render artifacts under a hash of the inputs that produced them."""
+
+    def __init__(self, cache_dir: str = 'cache', max_bytes: int = 500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Hash the given inputs (script text, resolution, fps, font, ...) into a cache key."""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def file_digest(path: str) -> str:
+        """Hash a file's contents, for keys derived from an earlier render's output."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def path_for(self, kind: str, key: str, suffix: str) -> str:
+        """Return where an entry of this kind and key lives on disk."""
+        return os.path.join(self.cache_dir, f"{kind}_{key}{suffix}")
+
+    def get(self, kind: str, key: str, suffix: str) -> Optional[str]:
+        """Return the cached file path on a hit, or None on a miss."""
+        path = self.path_for(kind, key, suffix)
+        if os.path.exists(path):
+            self.hits += 1
+            # Touch the entry so LRU eviction keeps it
+            os.utime(path, None)
+            return path
+        self.misses += 1
+        return None
+
+    def put(self, kind: str, key: str, source_path: str, suffix: str) -> str:
+        """Copy a freshly rendered file into the cache and evict old entries.
+
+        The copy goes through a temporary file of its own, so concurrent
+        writers of the same key (the pre-render worker and an on-demand
+        render) never mix their bytes; the last rename wins.
+        """
+        path = self.path_for(kind, key, suffix)
+        fd, temp_path = tempfile.mkstemp(prefix=f".{kind}_", suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp, open(source_path, 'rb') as source:
+                shutil.copyfileobj(source, temp)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """Return (mtime, size, path) for every cached file, oldest first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp') or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Evicted by another process since the listing
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits in max_bytes.
+
+        `keep` (the entry just stored) is never removed, even if it alone is
+        over the limit.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                logging.info(f"Render cache evicted {os.path.basename(path)}")
+            except OSError as e:
+                logging.error(f"Error evicting cache entry {path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size."""
+        entries = self.entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries)
+        }
@@ -5,10 +5,10 @@ Send a sample girlfriend email to see the full formatting
 
 import os
 import random
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+from smtp_pool import get_pool
 
 
 load_dotenv('config.env')
@@ -84,12 +84,8 @@ def send_sample_girlfriend_email():
         msg.attach(MIMEText(html_message, 'html'))
         
         # Send email
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(email_sender, email_password)
         text = msg.as_string()
-        server.sendmail(email_sender, email_recipient, text)
-        server.quit()
+        get_pool(email_sender, email_password).sendmail(email_sender, email_recipient, text)
         
         print("✅ Sample girlfriend email sent successfully!")
         print(f"📧 Check your inbox at: {email_recipient}")
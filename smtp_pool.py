@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Tesphase SMTP Pool
+Shared, reusable SMTP sessions so each email doesn't pay for a fresh
+connect + STARTTLS + login. Idle sessions are checked with NOOP before reuse
+and reconnected when the server has dropped them.
+
+For local testing point the pool at a debugging server, e.g.
+    python -m aiosmtpd -n -l localhost:8025
+with SMTP_HOST=localhost, SMTP_PORT=8025 and SMTP_STARTTLS=false.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Bytes buffered before each socket write when streaming a message file
+SEND_BUFFER_SIZE = 64 * 1024
+
+# Errors after which a session can't be trusted and must be reopened
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def send_message_file(server: smtplib.SMTP, from_addr: str, to_addrs, message_path: str,
+                      to_header: str = None) -> dict:
+    """Like SMTP.sendmail, but streams the message from disk instead of memory.
+
+    `to_header`, if given, is sent as a To header before the file's contents.
+    Returns the refused recipients, as sendmail does.
+    """
+    if isinstance(to_addrs, str):
+        to_addrs = [to_addrs]
+    # Open the file before the transaction starts, so a missing file can't
+    # leave the session stuck inside DATA
+    with open(message_path, 'rb') as f:
+        return _send_open_file(server, from_addr, to_addrs, f, to_header)
+
+
+def _send_open_file(server: smtplib.SMTP, from_addr: str, to_addrs, f, to_header: str = None) -> dict:
+    server.ehlo_or_helo_if_needed()
+
+    code, response = server.mail(from_addr)
+    if code != 250:
+        _reset(server)
+        raise smtplib.SMTPSenderRefused(code, response, from_addr)
+    refused = {}
+    for recipient in to_addrs:
+        code, response = server.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, response)
+    if len(refused) == len(to_addrs):
+        _reset(server)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, response = server.docmd('data')
+    if code != 354:
+        _reset(server)
+        raise smtplib.SMTPDataError(code, response)
+
+    try:
+        buffer = bytearray()
+        if to_header:
+            buffer += f"To: {to_header}\r\n".encode('ascii')
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            # Dot-stuffing, as required for lines inside DATA
+            if line.startswith(b'.'):
+                buffer += b'.'
+            buffer += line + b'\r\n'
+            if len(buffer) >= SEND_BUFFER_SIZE:
+                server.send(bytes(buffer))
+                buffer.clear()
+        buffer += b'.\r\n'
+        server.send(bytes(buffer))
+    except Exception:
+        # The server is still reading the message body; the session can't be
+        # reused, so close it and let the pool discard it
+        server.close()
+        raise
+
+    code, response = server.getreply()
+    if code != 250:
+        _reset(server)
+        raise smtplib.SMTPDataError(code, response)
+    return refused
+
+
+def _reset(server: smtplib.SMTP):
+    try:
+        server.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+class SMTPPool:
+    """A bounded pool of logged-in SMTP sessions."""
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 size: int = 2, starttls: bool = True, keepalive: float = 60, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.starttls = starttls
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        # A session holds a slot while checked out or being pinged, so at most
+        # `size` sessions exist: acquire() only connects when none is idle
+        self.slots = threading.BoundedSemaphore(size)
+        # Held by the (one) caller of ping_idle()
+        self.lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open, secure and authenticate a new session."""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        return server
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        """Keep-alive check: the session is usable if NOOP succeeds."""
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP):
+        """Close a session, ignoring errors from an already dead connection."""
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def acquire(self) -> smtplib.SMTP:
+        """Check out a live session, reusing an idle one when possible."""
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self.idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                # Recently used sessions are trusted; older ones get a NOOP first
+                if time.monotonic() - last_used < self.keepalive or self._is_alive(server):
+                    return server
+                self._discard(server)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, server: smtplib.SMTP, broken: bool = False):
+        """Return a session to the pool, or close it if it is broken (or already closed)."""
+        try:
+            if broken or server.sock is None:
+                self._discard(server)
+            else:
+                self.idle.put((server, time.monotonic()))
+        finally:
+            self.slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled session."""
+        server = self.acquire()
+        try:
+            yield server
+        except CONNECTION_ERRORS:
+            self.release(server, broken=True)
+            raise
+        except Exception:
+            self.release(server)
+            raise
+        else:
+            self.release(server)
+
+    def sendmail(self, from_addr: str, to_addrs, msg: str):
+        """Send a message, reconnecting once if the pooled session was dropped."""
+        for attempt in range(2):
+            try:
+                with self.connection() as server:
+                    return server.sendmail(from_addr, to_addrs, msg)
+            except CONNECTION_ERRORS as e:
+                if attempt:
+                    raise
+                logging.info(f"SMTP session lost ({e}), reconnecting")
+
+    def send_file(self, from_addr: str, to_addrs, message_path: str, to_header: str = None):
+        """Stream a message file, reconnecting once if the pooled session was dropped."""
+        for attempt in range(2):
+            try:
+                with self.connection() as server:
+                    return send_message_file(server, from_addr, to_addrs, message_path, to_header)
+            except CONNECTION_ERRORS as e:
+                if attempt:
+                    raise
+                logging.info(f"SMTP session lost ({e}), reconnecting")
+
+    def ping_idle(self):
+        """Send NOOP on every idle session, dropping the ones that fail.
+
+        Each session being pinged is checked out under a slot like any other,
+        so senders can't open extra sessions meanwhile. Sessions senders take
+        first are skipped, and a ping already running elsewhere makes this a no-op.
+        """
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            checked_out = []
+            try:
+                while self.slots.acquire(blocking=False):
+                    try:
+                        checked_out.append(self.idle.get_nowait()[0])
+                    except queue.Empty:
+                        self.slots.release()
+                        break
+                alive = []
+                for server in checked_out:
+                    if self._is_alive(server):
+                        alive.append(server)
+                    else:
+                        self._discard(server)
+                # Put them back in their original order, most recently used on top
+                for server in reversed(alive):
+                    self.idle.put((server, time.monotonic()))
+            finally:
+                for _ in checked_out:
+                    self.slots.release()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        """Close every idle session."""
+        while True:
+            try:
+                server, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(server)
+
+
+_pools: Dict[Tuple[str, int, str], SMTPPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(username: str = None, password: str = None) -> SMTPPool:
+    """Return the shared pool for these credentials, configured from the environment."""
+    host = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+    port = int(os.getenv('SMTP_PORT', '587'))
+    with _pools_lock:
+        pool = _pools.get((host, port, username))
+        if pool is None:
+            pool = SMTPPool(
+                host, port, username, password,
+                size=int(os.getenv('SMTP_POOL_SIZE', '2')),
+                starttls=os.getenv('SMTP_STARTTLS', 'true').lower() != 'false',
+                keepalive=float(os.getenv('SMTP_KEEPALIVE_SECONDS', '60'))
+            )
+            _pools[(host, port, username)] = pool
+        return pool
+
+
+@atexit.register
+def close_all():
+    """Close every shared pool (runs automatically at interpreter exit)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
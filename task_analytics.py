@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tesphase Task Analytics
+Weekly and monthly hours by category, completion streaks and completion
+velocity over the whole task history.
+
+The history is read from the task store once into columnar NumPy arrays
+(day, category code, hours, completion day), and every report is a
+vectorized group-by over those columns. Columns are cached on disk and
+results in memory, both keyed on the store's change marker and running
+totals, so they are only rebuilt after tasks are added or changed. Each
+store file gets its own cache file.
+"""
+
+import hashlib
+import os
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from task_storage import TaskStore
+
+
+class TaskAnalytics:
+    """Cached columnar analytics over a task store."""
+
+    def __init__(self, store: TaskStore, cache_file: str = None):
+        self.store = store
+        self.cache_file = cache_file or self.default_cache_file(store)
+        self.fingerprint = None
+        self.columns: Dict[str, np.ndarray] = {}
+        self.categories: List[str] = []
+        self.results: Dict[Tuple, Any] = {}
+
+    @staticmethod
+    def default_cache_file(store: TaskStore) -> str:
+        """cache/task_analytics_<store file>_<hash of its full path>.npz"""
+        path = os.path.abspath(store.path)
+        digest = hashlib.sha256(path.encode()).hexdigest()[:8]
+        return os.path.join('cache', f"task_analytics_{os.path.basename(path).replace('.', '_')}_{digest}.npz")
+
+    def store_fingerprint(self) -> Tuple:
+        """The store's change marker and running totals; any change to a task moves them."""
+        stats = self.store.stats()
+        return self.store.change_marker(), stats['total'], stats['completed'], round(stats['hours'], 6)
+
+    def refresh(self):
+        """Rebuild (or reload) the columns if the store changed since they were built."""
+        fingerprint = self.store_fingerprint()
+        if fingerprint == self.fingerprint:
+            return
+        self.results = {}
+        if not self._load_cached(fingerprint):
+            self._build_columns()
+            self._save_cached(fingerprint)
+        self.fingerprint = fingerprint
+
+    def _build_columns(self):
+        """Read every task once into parallel arrays."""
+        codes: Dict[str, int] = {}
+        days, categories, hours, completed_days = [], [], [], []
+        for day, category, task_hours, completed, completed_at in self.store.iter_task_rows():
+            days.append(day)
+            categories.append(codes.setdefault(category, len(codes)))
+            hours.append(task_hours)
+            completed_days.append((completed_at or day)[:10] if completed else 'NaT')
+        self.categories = list(codes)
+        self.columns = {
+            'day': np.array(days, dtype='datetime64[D]'),
+            'category': np.array(categories, dtype=np.int32),
+            'hours': np.array(hours, dtype=np.float64),
+            'completed_day': np.array(completed_days, dtype='datetime64[D]')
+        }
+
+    def _load_cached(self, fingerprint: Tuple) -> bool:
+        if not os.path.exists(self.cache_file):
+            return False
+        try:
+            with np.load(self.cache_file) as cached:
+                if tuple(cached['fingerprint']) != fingerprint:
+                    return False
+                self.categories = [str(c) for c in cached['categories']]
+                self.columns = {name: cached[name] for name in ('day', 'category', 'hours', 'completed_day')}
+            return True
+        except (OSError, KeyError, ValueError):
+            return False
+
+    def _save_cached(self, fingerprint: Tuple):
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        temp_path = f"{self.cache_file}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, fingerprint=np.array(fingerprint, dtype=np.float64),
+                     categories=np.array(self.categories, dtype=str), **self.columns)
+        os.replace(temp_path, self.cache_file)
+
+    def _cached(self, key: Tuple, compute):
+        self.refresh()
+        if key not in self.results:
+            self.results[key] = compute()
+        return self.results[key]
+
+    def hours_by_category(self, period: str = 'week') -> Tuple[List[str], List[str], np.ndarray]:
+        """Hours per (period, category); returns (period starts, categories, matrix).
+
+        `period` is 'week' (weeks start on Monday) or 'month'.
+        """
+        return self._cached(('hours', period), lambda: self._hours_by_category(period))
+
+    def _hours_by_category(self, period: str):
+        days = self.columns['day']
+        if period == 'week':
+            # 1970-01-01 was a Thursday, so (days since epoch + 3) % 7 is the weekday
+            starts = days - (days.astype(np.int64) + 3) % 7
+        elif period == 'month':
+            starts = days.astype('datetime64[M]')
+        else:
+            raise ValueError(f"Unknown period: {period}")
+        periods, period_index = np.unique(starts, return_inverse=True)
+        width = len(self.categories)
+        totals = np.bincount(period_index * width + self.columns['category'],
+                             weights=self.columns['hours'], minlength=len(periods) * width)
+        return [str(p) for p in periods], list(self.categories), totals.reshape(len(periods), width)
+
+    def streaks(self, today: date = None) -> Dict[str, int]:
+        """Current and longest runs of consecutive days with a completed task."""
+        today = np.datetime64(today or date.today(), 'D')
+        return self._cached(('streaks', str(today)), lambda: self._streaks(today))
+
+    def _streaks(self, today: np.datetime64):
+        completed = self.columns['completed_day']
+        done_days = np.unique(completed[~np.isnat(completed)]).astype(np.int64)
+        if not len(done_days):
+            return {'current': 0, 'longest': 0}
+        run_ids = np.concatenate(([0], np.cumsum(np.diff(done_days) != 1)))
+        lengths = np.bincount(run_ids)
+        # A streak is still alive if the last completion was today or yesterday
+        alive = done_days[-1] >= today.astype(np.int64) - 1
+        return {'current': int(lengths[-1]) if alive else 0, 'longest': int(lengths.max())}
+
+    def completion_velocity(self, weeks: int = 4, today: date = None) -> Dict[str, Any]:
+        """Tasks completed per week over the last `weeks` weeks, and days from logging to completion."""
+        today = np.datetime64(today or date.today(), 'D')
+        return self._cached(('velocity', weeks, str(today)), lambda: self._completion_velocity(weeks, today))
+
+    def _completion_velocity(self, weeks: int, today: np.datetime64):
+        completed = self.columns['completed_day']
+        done = ~np.isnat(completed)
+        weeks_ago = (today - completed[done]).astype(np.int64) // 7
+        recent = (weeks_ago >= 0) & (weeks_ago < weeks)
+        # Oldest week first
+        per_week = np.bincount(weeks - 1 - weeks_ago[recent], minlength=weeks)
+        lag = (completed[done] - self.columns['day'][done]).astype(np.int64)
+        return {
+            'per_week': per_week.tolist(),
+            'average_per_week': float(per_week.mean()) if weeks else 0.0,
+            'average_days_to_complete': float(lag.mean()) if len(lag) else None
+        }
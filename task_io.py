@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tesphase Task Import/Export
+Bulk-loads tasks from CSV or JSONL time-tracking exports and writes them back
+out. Files are streamed row by row and the whole import is stored with a
+single transaction (SQLite) or a single snapshot save (JSON).
+
+Columns: date, category, description, hours, completed, timestamp, completed_at
+(only date, category and description are required; ids are assigned on import)
+
+Usage: python task_io.py [import <file.csv|file.jsonl> | export <file.csv|file.jsonl>]
+"""
+
+import csv
+import json
+import math
+import os
+import sys
+from datetime import date
+from typing import Any, Dict, Iterator, Tuple
+
+from progress_service import ProgressService
+from task_storage import TaskStore, open_store
+
+EXPORT_COLUMNS = ['id', 'date', 'category', 'description', 'hours', 'completed', 'timestamp', 'completed_at']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x', 'done'}
+
+
+def file_format(path: str) -> str:
+    """Return 'csv' or 'jsonl' based on the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Unsupported file type: {path} (use .csv or .jsonl)")
+
+
+def parse_task(row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Turn one CSV/JSONL record into a (day, task) pair, validating it."""
+    day = date.fromisoformat(str(row['date']).strip()[:10]).isoformat()
+    description = str(row['description']).strip()
+    if not description:
+        raise ValueError("empty description")
+    hours = float(row.get('hours') or 0)
+    if not math.isfinite(hours) or hours < 0:
+        raise ValueError(f"invalid hours: {row.get('hours')}")
+    completed = row.get('completed')
+    if not isinstance(completed, bool):
+        completed = str(completed or '').strip().lower() in TRUE_VALUES
+    task = {
+        'category': str(row['category']).strip() or 'other',
+        'description': description,
+        'hours': hours,
+        'completed': completed,
+        'timestamp': row.get('timestamp') or f"{day} 00:00:00"
+    }
+    if completed and row.get('completed_at'):
+        task['completed_at'] = row['completed_at']
+    return day, task
+
+
+def read_records(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Stream (line number, record) pairs from a CSV or JSONL file.
+
+    JSONL records are yielded as raw lines, so a malformed line can be
+    skipped like any other invalid record.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if file_format(path) == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_number, line
+
+
+def import_tasks(store: TaskStore, path: str, report_errors: int = 10) -> Tuple[int, int]:
+    """Import every valid record from `path`; returns (imported, skipped)."""
+    skipped = 0
+
+    def valid_tasks():
+        nonlocal skipped
+        for line_number, record in read_records(path):
+            try:
+                yield parse_task(json.loads(record) if isinstance(record, str) else record)
+            except (KeyError, TypeError, ValueError) as e:
+                skipped += 1
+                if skipped <= report_errors:
+                    print(f"⚠️  Line {line_number} skipped: {type(e).__name__}: {e}")
+
+    imported = store.add_tasks(valid_tasks())
+    return imported, skipped
+
+
+def export_tasks(store: TaskStore, path: str) -> int:
+    """Stream every task to a CSV or JSONL file; returns the number written."""
+    count = 0
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+        if file_format(path) == 'csv':
+            writer = csv.DictWriter(f, EXPORT_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for day, task in store.iter_tasks():
+                writer.writerow(dict(task, date=day))
+                count += 1
+        else:
+            for day, task in store.iter_tasks():
+                f.write(json.dumps(dict(task, date=day), ensure_ascii=False) + '\n')
+                count += 1
+    os.replace(temp_path, path)
+    return count
+
+
+def main():
+    """Import or export tasks from the command line."""
+    from dotenv import load_dotenv
+    load_dotenv('config.env')
+    if len(sys.argv) != 3 or sys.argv[1] not in ('import', 'export'):
+        print(__doc__.strip().splitlines()[-1])
+        return
+
+    command, path = sys.argv[1], sys.argv[2]
+    store = open_store()
+    try:
+        if command == 'import':
+            imported, skipped = import_tasks(store, path)
+            ProgressService(store).refresh()
+            print(f"✅ Imported {imported} tasks from {path}" + (f" ({skipped} skipped)" if skipped else ""))
+        else:
+            print(f"✅ Exported {export_tasks(store, path)} tasks to {path}")
+    except (OSError, ValueError) as e:
+        print(f"❌ {command.capitalize()} failed: {e}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
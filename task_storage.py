@@ -0,0 +1,935 @@
+#!/usr/bin/env python3
+"""
+Tesphase Task Storage
+Pluggable storage backends for the task tracker (and the bot's progress data).
+
+- "json": a JSON snapshot plus an append-only journal of events (one JSON
+  object per line), so saving a change costs one small write instead of
+  rewriting the whole history. The journal is periodically compacted into the
+  snapshot, which is swapped in with an atomic rename; startup loads the
+  snapshot and replays only the events logged after it. Writers hold an
+  exclusive lock on the store and first replay whatever other processes
+  appended, so several processes can share one store.
+- "sqlite" (the default): an SQLite database in WAL mode with tasks indexed
+  by date, category and completion, so queries don't load the full history.
+  The first time it is opened next to an existing JSON store, the tasks (and
+  the bot's progress file) are moved into it.
+
+Both backends maintain running aggregates (task and completion counts and
+hours, overall, per category and per day) on every change, so statistics
+never scan the history; `verify` checks them against a full rebuild.
+
+Usage: python task_storage.py [migrate <json|sqlite> <json|sqlite> | verify]
+"""
+
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def empty_tasks() -> Dict[str, Any]:
+    """The initial task data for a new tracker."""
+    return {
+        'start_date': datetime.now().strftime('%Y-%m-%d'),
+        'daily_tasks': {},
+        'milestones': [],
+        'total_hours': 0,
+        'next_task_id': 1,
+        'aggregates': empty_aggregates()
+    }
+
+
+def empty_bucket() -> Dict[str, Any]:
+    return {'total': 0, 'completed': 0, 'hours': 0}
+
+
+def empty_aggregates() -> Dict[str, Any]:
+    """Running totals overall, per category and per day."""
+    return dict(empty_bucket(), categories={}, days={})
+
+
+def count_task(aggregates: Dict[str, Any], day: str, task: Dict[str, Any]):
+    """Add a new task to the running totals."""
+    for bucket in (aggregates,
+                   aggregates['categories'].setdefault(task['category'], empty_bucket()),
+                   aggregates['days'].setdefault(day, empty_bucket())):
+        bucket['total'] += 1
+        bucket['hours'] += task['hours']
+        if task['completed']:
+            bucket['completed'] += 1
+
+
+def count_completion(aggregates: Dict[str, Any], day: str, task: Dict[str, Any]):
+    """Record that a task already counted by count_task was completed."""
+    for bucket in (aggregates, aggregates['categories'][task['category']], aggregates['days'][day]):
+        bucket['completed'] += 1
+
+
+def build_aggregates(tasks: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Compute the aggregates from scratch over (day, task) pairs."""
+    aggregates = empty_aggregates()
+    for day, task in tasks:
+        count_task(aggregates, day, task)
+    return aggregates
+
+
+def apply_event(data: Dict[str, Any], event: Dict[str, Any], index: Dict[int, Tuple[str, Dict]] = None):
+    """Apply one journal event to the in-memory task data and its aggregates.
+
+    When given, `index` (task id -> (day, task)) is used for lookups and kept
+    up to date; without it tasks are found by scanning the event's day.
+    """
+    kind = event['type']
+    if kind == 'add_task':
+        task = event['task']
+        data['daily_tasks'].setdefault(event['date'], []).append(task)
+        data['next_task_id'] = max(data.get('next_task_id', 1), task['id'] + 1)
+        if index is not None:
+            index[task['id']] = (event['date'], task)
+        count_task(data['aggregates'], event['date'], task)
+        data['total_hours'] = data['aggregates']['hours']
+    elif kind == 'complete_task':
+        if index is not None:
+            _, task = index[event['id']]
+        else:
+            task = next(t for t in data['daily_tasks'][event['date']] if t['id'] == event['id'])
+        if not task['completed']:
+            count_completion(data['aggregates'], event['date'], task)
+        task['completed'] = True
+        task['completed_at'] = event['completed_at']
+    elif kind == 'add_milestone':
+        data['milestones'].append(event['milestone'])
+    elif kind == 'set_start_date':
+        data['start_date'] = event['start_date']
+    else:
+        raise ValueError(f"Unknown task event: {kind}")
+
+
+def lock_file(f):
+    """Block until this process holds an exclusive lock on the open file `f`."""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            # LK_LOCK gives up after about 10 seconds; keep waiting
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def unlock_file(f):
+    """Release a lock taken with lock_file()."""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _rounded(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Round hours so float sums in different orders compare equal."""
+    return {
+        key: _rounded(value) if isinstance(value, dict) else round(value, 6) if key == 'hours' else value
+        for key, value in stats.items()
+    }
+
+
+class TaskStore:
+    """Interface shared by every task storage backend."""
+
+    def add_task(self, day: str, task: Dict[str, Any]):
+        """Store a new task logged on `day` (YYYY-MM-DD).
+
+        A task without an id gets the next free one, assigned atomically with
+        the write and set on `task`.
+        """
+        raise NotImplementedError
+
+    def next_task_id(self) -> int:
+        """The id the next new task would get now; ids are unique across all days.
+
+        Another process may take it first, so leave the id out of add_task()
+        rather than passing this in.
+        """
+        raise NotImplementedError
+
+    def add_tasks(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Store many (day, task) pairs with one write; tasks get fresh ids. Returns the count."""
+        raise NotImplementedError
+
+    def complete_task(self, task_id: int, completed_at: str) -> Optional[Dict[str, Any]]:
+        """Mark a task (from any day) completed; returns it, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    def add_milestone(self, milestone: Dict[str, Any]):
+        raise NotImplementedError
+
+    @property
+    def path(self) -> str:
+        """The file the store lives in."""
+        raise NotImplementedError
+
+    def change_marker(self) -> int:
+        """A counter that moves whenever a task is added or changed, including from other processes."""
+        raise NotImplementedError
+
+    def tasks_for_day(self, day: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def iter_tasks(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (day, task) for every task, oldest day first."""
+        raise NotImplementedError
+
+    def iter_task_rows(self) -> Iterator[Tuple[str, str, float, bool, Optional[str]]]:
+        """Yield (day, category, hours, completed, completed_at) for every task, in any order.
+
+        A lighter-weight scan than iter_tasks() for bulk analytics.
+        """
+        for day, task in self.iter_tasks():
+            yield day, task['category'], task['hours'], task['completed'], task.get('completed_at')
+
+    def milestones(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def milestone_count(self) -> int:
+        return len(self.milestones())
+
+    def stats(self) -> Dict[str, Any]:
+        """Running totals: total, completed and hours, overall and per category."""
+        raise NotImplementedError
+
+    def day_stats(self, day: str) -> Dict[str, Any]:
+        """Running totals for one day."""
+        raise NotImplementedError
+
+    def rebuild_stats(self):
+        """Recompute the running totals from a full scan of the tasks."""
+        raise NotImplementedError
+
+    def verify_stats(self) -> bool:
+        """Check the running totals against a full rebuild from the tasks."""
+        expected = build_aggregates(self.iter_tasks())
+        if _rounded(self.stats()) != _rounded({k: v for k, v in expected.items() if k != 'days'}):
+            return False
+        return all(_rounded(self.day_stats(day)) == _rounded(bucket)
+                   for day, bucket in expected['days'].items())
+
+    def task_counts(self) -> Tuple[int, int]:
+        """Return (total tasks, completed tasks)."""
+        stats = self.stats()
+        return stats['total'], stats['completed']
+
+    def start_date(self) -> str:
+        raise NotImplementedError
+
+    def set_start_date(self, start_date: str):
+        raise NotImplementedError
+
+    def total_hours(self) -> float:
+        return self.stats()['hours']
+
+    @contextmanager
+    def batch(self):
+        """Group several changes into one write (or transaction)."""
+        yield self
+
+    def close(self):
+        pass
+
+
+class JournalStore(TaskStore):
+    """JSON snapshot plus an append-only event journal."""
+
+    def __init__(self, snapshot_file: str = 'tesphase_tasks.json', journal_file: str = None,
+                 compact_every: int = 500, sync: bool = True):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or f"{os.path.splitext(snapshot_file)[0]}.journal"
+        self.lock_path = f"{self.journal_file}.lock"
+        self.compact_every = compact_every
+        self.sync = sync
+        self.data = None
+        self.seq = 0
+        self.pending = 0
+        self.journal = None
+        self.batch_lines = None
+        # Task id -> (day, task), for constant-time lookups
+        self.index = {}
+        # How much of the snapshot and journal this process has read, so it
+        # can catch up on changes made by other processes
+        self.snapshot_version = None
+        self.journal_offset = 0
+        self.lock_handle = None
+        self.lock_depth = 0
+        self.thread_lock = threading.RLock()
+
+    @contextmanager
+    def locked(self):
+        """Hold the store's exclusive lock, first catching up on other processes' changes.
+
+        Every write runs under it, so sequence numbers are assigned after the
+        latest journal line and compaction never drops lines another process
+        appended. Nested uses share the outermost lock.
+        """
+        with self.thread_lock:
+            if self.lock_depth == 0:
+                if self.lock_handle is None:
+                    self.lock_handle = open(self.lock_path, 'a+b')
+                lock_file(self.lock_handle)
+            self.lock_depth += 1
+            try:
+                if self.lock_depth == 1 and self.data is not None:
+                    self._catch_up()
+                yield self
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    unlock_file(self.lock_handle)
+
+    def load(self) -> Dict[str, Any]:
+        """Load the snapshot and replay the journal tail written after it."""
+        with self.locked():
+            self._read_snapshot()
+            # Snapshots from before ids were global numbered tasks per day
+            renumber = 'next_task_id' not in self.data
+            self._replay_journal()
+            if renumber:
+                self._renumber_tasks()
+            self.index = {task['id']: (day, task) for day, task in self.iter_tasks()}
+
+            if self.journal is None:
+                self.journal = open(self.journal_file, 'ab')
+            if renumber or self.snapshot_version is None or self.pending >= self.compact_every:
+                self.compact()
+        return self.data
+
+    def _snapshot_stat(self):
+        """Identifies the snapshot file's current version (None if there is none)."""
+        try:
+            stat = os.stat(self.snapshot_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_snapshot(self):
+        self.snapshot_version = self._snapshot_stat()
+        if self.snapshot_version is not None:
+            with open(self.snapshot_file, 'r') as f:
+                self.data = json.load(f)
+        else:
+            self.data = empty_tasks()
+        # Events up to this sequence number are already in the snapshot
+        self.seq = self.data.pop('journal_seq', 0)
+        if 'aggregates' not in self.data:
+            # Snapshots from before aggregates were kept
+            self.rebuild_stats()
+        self.pending = 0
+        self.journal_offset = 0
+
+    def _replay_journal(self, index: Dict[int, Tuple[str, Dict]] = None):
+        """Apply the journal lines after journal_offset that aren't in the data yet."""
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'rb') as f:
+            f.seek(self.journal_offset)
+            for line in f:
+                # A crash mid-append leaves a final line without its newline,
+                # even if what was written parses; drop it so the next
+                # append doesn't run on from it
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                self.journal_offset += len(line)
+                if event['seq'] <= self.seq:
+                    continue
+                apply_event(self.data, event, index)
+                self.seq = event['seq']
+                self.pending += 1
+            size = f.seek(0, os.SEEK_END)
+        if self.journal_offset != size:
+            # Only a writer that died mid-append leaves this, as we hold the lock
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(self.journal_offset)
+
+    def _catch_up(self):
+        """Bring the in-memory data up to date with the files; call with the lock held."""
+        journal_size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        if self._snapshot_stat() != self.snapshot_version or journal_size < self.journal_offset:
+            # Another process compacted; start again from its snapshot
+            self._read_snapshot()
+            self._replay_journal()
+            self.index = {task['id']: (day, task) for day, task in self.iter_tasks()}
+        elif journal_size > self.journal_offset:
+            self._replay_journal(self.index)
+
+    def _renumber_tasks(self):
+        """Give every task a global id, in the order they were logged."""
+        next_id = 1
+        for _, task in self.iter_tasks():
+            task['id'] = next_id
+            next_id += 1
+        self.data['next_task_id'] = next_id
+
+    def record(self, event: Dict[str, Any]):
+        """Apply an event and append it to the journal."""
+        self.record_many([event])
+
+    def record_many(self, events: Iterable[Dict[str, Any]]):
+        """Apply several events and append them with a single write."""
+        with self.locked():
+            lines = []
+            for event in events:
+                self.seq += 1
+                event = dict(event, seq=self.seq)
+                if event['type'] == 'add_task':
+                    task = event['task']
+                    # Ids are only assigned here, after catching up, so two
+                    # processes can't hand out the same one
+                    if task.get('id') is None or task['id'] in self.index:
+                        task['id'] = self.data['next_task_id']
+                apply_event(self.data, event, self.index)
+                lines.append(json.dumps(event, ensure_ascii=False))
+            if self.batch_lines is not None:
+                self.batch_lines.extend(lines)
+            else:
+                self._write(lines)
+
+    def _write(self, lines: List[str]):
+        if not lines:
+            return
+        self.journal.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        self.journal.flush()
+        if self.sync:
+            os.fsync(self.journal.fileno())
+        # We hold the lock and had read up to the old end of the journal
+        self.journal_offset = os.fstat(self.journal.fileno()).st_size
+        self.pending += len(lines)
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    @contextmanager
+    def batch(self):
+        """Buffer events and append them to the journal in one write, holding the lock throughout."""
+        if self.batch_lines is not None:
+            yield self
+            return
+        with self.locked():
+            self.batch_lines = []
+            try:
+                yield self
+            finally:
+                lines, self.batch_lines = self.batch_lines, None
+                self._write(lines)
+
+    def compact(self):
+        """Write a fresh snapshot atomically and start an empty journal."""
+        with self.locked():
+            temp_path = f"{self.snapshot_file}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(dict(self.data, journal_seq=self.seq), f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_file)
+            self.snapshot_version = self._snapshot_stat()
+            # The snapshot records journal_seq, so a crash before this truncate
+            # only leaves events that the next load skips
+            self.journal.truncate(0)
+            self.journal_offset = 0
+            self.pending = 0
+
+    def close(self):
+        """Close the journal and lock files."""
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        if self.lock_handle:
+            self.lock_handle.close()
+            self.lock_handle = None
+
+    def add_task(self, day, task):
+        self.record({'type': 'add_task', 'date': day, 'task': task})
+
+    def next_task_id(self):
+        with self.locked():
+            return self.data['next_task_id']
+
+    def add_tasks(self, items):
+        """Apply the tasks in memory and save them with one snapshot, not one journal line each."""
+        count = 0
+        with self.locked():
+            for day, task in items:
+                apply_event(self.data, {'type': 'add_task', 'date': day,
+                                        'task': dict(task, id=self.data['next_task_id'])}, self.index)
+                count += 1
+            if count:
+                # The import is one change; the snapshot saves it as journal_seq
+                self.seq += 1
+            self.compact()
+        return count
+
+    def complete_task(self, task_id, completed_at):
+        with self.locked():
+            if task_id not in self.index:
+                return None
+            day, task = self.index[task_id]
+            self.record({'type': 'complete_task', 'date': day, 'id': task_id, 'completed_at': completed_at})
+            return task
+
+    def add_milestone(self, milestone):
+        self.record({'type': 'add_milestone', 'milestone': milestone})
+
+    def tasks_for_day(self, day):
+        return list(self.data['daily_tasks'].get(day, []))
+
+    def iter_tasks(self):
+        for day in sorted(self.data['daily_tasks']):
+            for task in self.data['daily_tasks'][day]:
+                yield day, task
+
+    def milestones(self):
+        return list(self.data['milestones'])
+
+    def milestone_count(self):
+        return len(self.data['milestones'])
+
+    def stats(self):
+        return {k: v for k, v in self.data['aggregates'].items() if k != 'days'}
+
+    def day_stats(self, day):
+        return self.data['aggregates']['days'].get(day, empty_bucket())
+
+    def rebuild_stats(self):
+        self.data['aggregates'] = build_aggregates(self.iter_tasks())
+        # total_hours is kept for older readers of the snapshot
+        self.data['total_hours'] = self.data['aggregates']['hours']
+
+    def start_date(self):
+        return self.data['start_date']
+
+    def set_start_date(self, start_date):
+        self.record({'type': 'set_start_date', 'start_date': start_date})
+
+    @property
+    def path(self):
+        return self.snapshot_file
+
+    def change_marker(self):
+        # Every event gets the next journal sequence number
+        with self.locked():
+            return self.seq
+
+
+TASK_COLUMNS = ('id', 'category', 'description', 'hours', 'completed', 'timestamp', 'completed_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    row_id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    hours REAL NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    timestamp TEXT,
+    completed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_day ON tasks (day, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed);
+CREATE TABLE IF NOT EXISTS milestones (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    date TEXT,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS category_stats (
+    category TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    hours REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS day_stats (
+    day TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    hours REAL NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS tasks_stats_complete AFTER UPDATE OF completed ON tasks
+WHEN NEW.completed != OLD.completed BEGIN
+    UPDATE category_stats SET completed = completed + NEW.completed - OLD.completed WHERE category = NEW.category;
+    UPDATE day_stats SET completed = completed + NEW.completed - OLD.completed WHERE day = NEW.day;
+END;
+CREATE TABLE IF NOT EXISTS progress (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+STATS_INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS tasks_stats_insert AFTER INSERT ON tasks BEGIN
+    INSERT OR IGNORE INTO category_stats (category) VALUES (NEW.category);
+    UPDATE category_stats SET total = total + 1, completed = completed + NEW.completed, hours = hours + NEW.hours
+        WHERE category = NEW.category;
+    INSERT OR IGNORE INTO day_stats (day) VALUES (NEW.day);
+    UPDATE day_stats SET total = total + 1, completed = completed + NEW.completed, hours = hours + NEW.hours
+        WHERE day = NEW.day;
+END
+"""
+
+
+class SQLiteStore(TaskStore):
+    """SQLite backend in WAL mode with indexed task queries."""
+
+    def __init__(self, db_file: str = 'tesphase_tasks.db'):
+        self.db_file = db_file
+        # The bot saves progress from scheduler worker threads; the lock
+        # serializes those calls on the shared connection
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(STATS_INSERT_TRIGGER)
+        self.in_batch = False
+        if self._get_meta('start_date') is None:
+            self._set_meta('start_date', datetime.now().strftime('%Y-%m-%d'))
+            self._commit()
+        if self._get_meta('task_ids') is None:
+            # Databases from before ids were global numbered tasks per day
+            with self.batch():
+                self.conn.execute("UPDATE tasks SET id = row_id")
+                self._set_meta('task_ids', 'global')
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_id ON tasks (id)")
+        if self._get_meta('stats_version') is None:
+            # Databases created before the stats tables existed
+            self.rebuild_stats()
+
+    def _commit(self):
+        if not self.in_batch:
+            self.conn.commit()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key: str, value: Any):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _bump_changes(self):
+        """Move the change marker, in the same transaction as the change."""
+        self.conn.execute("INSERT INTO meta (key, value) VALUES ('changes', 1) "
+                          "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+    @staticmethod
+    def _task_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        task = {
+            'id': row['id'],
+            'category': row['category'],
+            'description': row['description'],
+            'hours': row['hours'],
+            'completed': bool(row['completed']),
+            'timestamp': row['timestamp']
+        }
+        if row['completed_at'] is not None:
+            task['completed_at'] = row['completed_at']
+        return task
+
+    @contextmanager
+    def batch(self):
+        """Run several changes in a single transaction."""
+        if self.in_batch:
+            yield self
+            return
+        self.in_batch = True
+        try:
+            yield self
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.in_batch = False
+
+    def add_task(self, day, task):
+        # A missing id is picked inside the INSERT, under SQLite's write lock
+        cursor = self.conn.execute(
+            f"INSERT INTO tasks (day, {', '.join(TASK_COLUMNS)}) "
+            f"VALUES (?, COALESCE(?, (SELECT COALESCE(MAX(id), 0) + 1 FROM tasks)), ?, ?, ?, ?, ?, ?)",
+            (day, task.get('id'), task['category'], task['description'], task['hours'],
+             int(task['completed']), task.get('timestamp'), task.get('completed_at'))
+        )
+        task['id'] = self.conn.execute("SELECT id FROM tasks WHERE row_id = ?", (cursor.lastrowid,)).fetchone()[0]
+        self._bump_changes()
+        self._commit()
+
+    def next_task_id(self):
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tasks").fetchone()[0]
+
+    def add_tasks(self, items):
+        """Insert the tasks in a single transaction, streaming them from `items`."""
+        next_id = self.next_task_id()
+        counter = itertools.count()
+
+        def rows():
+            for day, task in items:
+                yield (day, next_id + next(counter), task['category'], task['description'], task['hours'],
+                       int(task['completed']), task.get('timestamp'), task.get('completed_at'))
+
+        # Per-row stats triggers dominate bulk inserts; drop them for the
+        # transaction and fold the new rows into the stats in one pass
+        with self.batch():
+            # DDL doesn't open a transaction implicitly
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            self.conn.execute("DROP TRIGGER tasks_stats_insert")
+            first_row = self.conn.execute("SELECT COALESCE(MAX(row_id), 0) FROM tasks").fetchone()[0]
+            self.conn.executemany(
+                f"INSERT INTO tasks (day, {', '.join(TASK_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows()
+            )
+            for table, column in (('category_stats', 'category'), ('day_stats', 'day')):
+                self.conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) "
+                                  f"SELECT DISTINCT {column} FROM tasks WHERE row_id > ?", (first_row,))
+                self.conn.execute(
+                    f"UPDATE {table} SET (total, completed, hours) = "
+                    f"(SELECT {table}.total + COUNT(*), {table}.completed + SUM(completed), {table}.hours + SUM(hours) "
+                    f"FROM tasks WHERE row_id > ? AND {column} = {table}.{column}) "
+                    f"WHERE {column} IN (SELECT DISTINCT {column} FROM tasks WHERE row_id > ?)",
+                    (first_row, first_row)
+                )
+            self.conn.execute(STATS_INSERT_TRIGGER)
+            self._bump_changes()
+        return next(counter)
+
+    def complete_task(self, task_id, completed_at):
+        cursor = self.conn.execute(
+            "UPDATE tasks SET completed = 1, completed_at = ? WHERE id = ?",
+            (completed_at, task_id)
+        )
+        if cursor.rowcount:
+            self._bump_changes()
+        self._commit()
+        if cursor.rowcount == 0:
+            return None
+        row = self.conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._task_from_row(row)
+
+    def add_milestone(self, milestone):
+        self.conn.execute(
+            "INSERT INTO milestones (id, title, description, date, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (milestone['id'], milestone['title'], milestone['description'], milestone['date'], milestone['timestamp'])
+        )
+        self._commit()
+
+    def tasks_for_day(self, day):
+        rows = self.conn.execute("SELECT * FROM tasks WHERE day = ? ORDER BY id", (day,))
+        return [self._task_from_row(row) for row in rows]
+
+    def iter_tasks(self):
+        for row in self.conn.execute("SELECT * FROM tasks ORDER BY day, row_id"):
+            yield row['day'], self._task_from_row(row)
+
+    def iter_task_rows(self):
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        yield from cursor.execute("SELECT day, category, hours, completed, completed_at FROM tasks")
+
+    def milestones(self):
+        rows = self.conn.execute("SELECT id, title, description, date, timestamp FROM milestones ORDER BY id")
+        return [dict(row) for row in rows]
+
+    def milestone_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM milestones").fetchone()[0]
+
+    def stats(self):
+        categories = {
+            row['category']: {'total': row['total'], 'completed': row['completed'], 'hours': row['hours']}
+            for row in self.conn.execute("SELECT * FROM category_stats WHERE total > 0")
+        }
+        stats = empty_bucket()
+        for bucket in categories.values():
+            for key in stats:
+                stats[key] += bucket[key]
+        return dict(stats, categories=categories)
+
+    def day_stats(self, day):
+        row = self.conn.execute("SELECT total, completed, hours FROM day_stats WHERE day = ?", (day,)).fetchone()
+        return dict(row) if row else empty_bucket()
+
+    def rebuild_stats(self):
+        with self.batch():
+            self.conn.execute("DELETE FROM category_stats")
+            self.conn.execute("DELETE FROM day_stats")
+            for table, column in (('category_stats', 'category'), ('day_stats', 'day')):
+                self.conn.execute(
+                    f"INSERT INTO {table} ({column}, total, completed, hours) "
+                    f"SELECT {column}, COUNT(*), SUM(completed), SUM(hours) FROM tasks GROUP BY {column}"
+                )
+            self._set_meta('stats_version', 1)
+
+    def start_date(self):
+        return self._get_meta('start_date')
+
+    def set_start_date(self, start_date):
+        self._set_meta('start_date', start_date)
+        self._commit()
+
+    def load_progress(self) -> Optional[Dict[str, Any]]:
+        """Load the bot's progress data, or None if none has been saved."""
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM progress").fetchall()
+        return {row['key']: json.loads(row['value']) for row in rows} or None
+
+    def save_progress(self, progress: Dict[str, Any]):
+        """Save the bot's progress data."""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO progress (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in progress.items()]
+            )
+            self._commit()
+
+    @property
+    def path(self):
+        return self.db_file
+
+    def change_marker(self):
+        return int(self._get_meta('changes') or 0)
+
+    def close(self):
+        self.conn.close()
+
+
+def storage_backend() -> str:
+    """The configured backend name (TASK_STORAGE), "sqlite" unless set."""
+    return os.getenv('TASK_STORAGE', 'sqlite')
+
+
+def open_store(backend: str = None) -> TaskStore:
+    """Open the configured task store (TASK_STORAGE=sqlite|json)."""
+    backend = backend or storage_backend()
+    if backend == 'sqlite':
+        db_file = os.getenv('TASK_DB', 'tesphase_tasks.db')
+        if not os.path.exists(db_file):
+            migrate_json_store(os.getenv('TASKS_FILE', 'tesphase_tasks.json'), db_file)
+        return SQLiteStore(db_file)
+    if backend == 'json':
+        store = JournalStore(os.getenv('TASKS_FILE', 'tesphase_tasks.json'))
+        store.load()
+        return store
+    raise ValueError(f"Unknown task storage backend: {backend}")
+
+
+def migrate(source: TaskStore, target: TaskStore) -> int:
+    """Copy all tasks and milestones from one store into another; returns the task count."""
+    count = 0
+    with target.batch():
+        target.set_start_date(source.start_date())
+        for day, task in source.iter_tasks():
+            target.add_task(day, task)
+            count += 1
+        for milestone in source.milestones():
+            target.add_milestone(milestone)
+    return count
+
+
+def copy_progress(target: 'SQLiteStore', progress_file: str = 'tesphase_progress.json'):
+    """Carry the bot's progress file over into the task database."""
+    if os.path.exists(progress_file):
+        with open(progress_file, 'r') as f:
+            target.save_progress(json.load(f))
+
+
+def migrate_json_store(snapshot_file: str, db_file: str, progress_file: str = 'tesphase_progress.json'):
+    """Create `db_file` from an existing JSON store and progress file, if there are any.
+
+    The database is built under a temporary name and renamed into place, while
+    holding the JSON store's lock, so it is created exactly once even if
+    several processes start at the same time.
+    """
+    if not os.path.exists(snapshot_file) and not os.path.exists(progress_file):
+        return
+    source = None
+    if os.path.exists(snapshot_file):
+        source = JournalStore(snapshot_file)
+        source.load()
+    try:
+        with source.locked() if source else nullcontext():
+            if os.path.exists(db_file):
+                return
+            temp_path = f"{db_file}.migrating"
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            target = SQLiteStore(temp_path)
+            count = migrate(source, target) if source else 0
+            copy_progress(target, progress_file)
+            target.close()
+            os.replace(temp_path, db_file)
+            logging.info(f"Moved {count} tasks from {snapshot_file} into {db_file}")
+    finally:
+        if source:
+            source.close()
+
+
+def main():
+    """Command line entry point for migrations and aggregate checks."""
+    from dotenv import load_dotenv
+    load_dotenv('config.env')
+    if sys.argv[1:] == ['verify']:
+        store = open_store()
+        if store.verify_stats():
+            print("✅ Aggregates match a full rebuild")
+        else:
+            store.rebuild_stats()
+            if hasattr(store, 'compact'):
+                store.compact()
+            print("🔧 Aggregates had drifted and were rebuilt")
+        store.close()
+        return
+
+    if len(sys.argv) != 4 or sys.argv[1] != 'migrate' or sys.argv[2] == sys.argv[3]:
+        print(__doc__.strip().splitlines()[-1])
+        return
+
+    source = open_store(sys.argv[2])
+    # Opened directly, so opening it doesn't already move the JSON tasks in
+    target = SQLiteStore(os.getenv('TASK_DB', 'tesphase_tasks.db')) if sys.argv[3] == 'sqlite' else open_store(sys.argv[3])
+    if target.task_counts()[0]:
+        print(f"❌ The {sys.argv[3]} store already has tasks; refusing to migrate into it")
+        return
+    count = migrate(source, target)
+
+    # Carry the bot's progress file over when moving to SQLite
+    if isinstance(target, SQLiteStore):
+        copy_progress(target)
+
+    source.close()
+    target.close()
+    print(f"✅ Migrated {count} tasks from {sys.argv[2]} to {sys.argv[3]}")
+
+
+if __name__ == "__main__":
+    main()
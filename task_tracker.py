@@ -2,16 +2,23 @@
 """
 Tesphase Task Tracker
 Simple tool to log your daily progress on Tesphase startup tasks
+
+Run without arguments for the interactive menu, or use a subcommand from
+scripts and shell hooks:
+  python task_tracker.py add <category> <description> [--hours N]
+  python task_tracker.py complete <task id>
+  python task_tracker.py today | stats | milestones | analytics
 """
 
-import json
-import os
+import argparse
+import sys
 from datetime import datetime, date
-from typing import List, Dict
+
+from progress_service import ProgressService
+from task_storage import open_store
 
 class TesphaseTaskTracker:
     def __init__(self):
-        self.tasks_file = 'tesphase_tasks.json'
         self.load_tasks()
         
         # Predefined task categories for Tesphase
@@ -29,45 +36,23 @@ class TesphaseTaskTracker:
         }
 
     def load_tasks(self):
-        """Load existing tasks from file."""
-        try:
-            if os.path.exists(self.tasks_file):
-                with open(self.tasks_file, 'r') as f:
-                    self.tasks = json.load(f)
-            else:
-                self.tasks = {
-                    'start_date': datetime.now().strftime('%Y-%m-%d'),
-                    'daily_tasks': {},
-                    'milestones': [],
-                    'total_hours': 0
-                }
-                self.save_tasks()
-        except Exception as e:
-            print(f"Error loading tasks: {e}")
-            self.tasks = {
-                'start_date': datetime.now().strftime('%Y-%m-%d'),
-                'daily_tasks': {},
-                'milestones': [],
-                'total_hours': 0
-            }
+        """Open the configured task store (TASK_STORAGE=sqlite|json)."""
+        self.store = open_store()
+        self.progress = ProgressService(self.store)
 
-    def save_tasks(self):
-        """Save tasks to file."""
+    def refresh_progress(self):
+        """Update the daily digest the bot reads for its evening summary."""
         try:
-            with open(self.tasks_file, 'w') as f:
-                json.dump(self.tasks, f, indent=2)
+            self.progress.refresh()
         except Exception as e:
-            print(f"Error saving tasks: {e}")
+            print(f"Error updating progress digest: {e}")
 
     def add_task(self, category: str, description: str, hours: float = 0):
         """Add a new task for today."""
         today = date.today().strftime('%Y-%m-%d')
         
-        if today not in self.tasks['daily_tasks']:
-            self.tasks['daily_tasks'][today] = []
-        
+        # The store assigns the id when it saves the task
         task = {
-            'id': len(self.tasks['daily_tasks'][today]) + 1,
             'category': category,
             'description': description,
             'hours': hours,
@@ -75,26 +60,29 @@ class TesphaseTaskTracker:
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        self.tasks['daily_tasks'][today].append(task)
-        self.tasks['total_hours'] += hours
-        self.save_tasks()
+        try:
+            self.store.add_task(today, task)
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return
+        self.refresh_progress()
         
-        print(f"✅ Task added: {self.task_categories.get(category, category)} - {description}")
+        print(f"✅ Task added: [{task['id']}] {self.task_categories.get(category, category)} - {description}")
 
     def complete_task(self, task_id: int):
-        """Mark a task as completed."""
-        today = date.today().strftime('%Y-%m-%d')
-        
-        if today in self.tasks['daily_tasks']:
-            for task in self.tasks['daily_tasks'][today]:
-                if task['id'] == task_id:
-                    task['completed'] = True
-                    task['completed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    self.save_tasks()
-                    print(f"🎉 Task completed: {task['description']}")
-                    return
+        """Mark a task (from any day) as completed."""
+        try:
+            task = self.store.complete_task(task_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return
+        if task:
+            self.refresh_progress()
+            print(f"🎉 Task completed: {task['description']}")
+            return True
         
         print("❌ Task not found")
+        return False
 
     def show_today_tasks(self):
         """Display today's tasks."""
@@ -103,7 +91,8 @@ class TesphaseTaskTracker:
         print(f"\n🌞 Tesphase Tasks for {today} 🌞")
         print("=" * 50)
         
-        if today not in self.tasks['daily_tasks'] or not self.tasks['daily_tasks'][today]:
+        today_tasks = self.store.tasks_for_day(today)
+        if not today_tasks:
             print("No tasks logged for today yet!")
             print("\n💡 Suggested focus areas:")
             for category, name in self.task_categories.items():
@@ -113,7 +102,7 @@ class TesphaseTaskTracker:
         total_hours = 0
         completed_tasks = 0
         
-        for task in self.tasks['daily_tasks'][today]:
+        for task in today_tasks:
             status = "✅" if task['completed'] else "⏳"
             category_name = self.task_categories.get(task['category'], task['category'])
             print(f"{status} [{task['id']}] {category_name}")
@@ -126,7 +115,7 @@ class TesphaseTaskTracker:
             if task['completed']:
                 completed_tasks += 1
         
-        print(f"📊 Summary: {completed_tasks}/{len(self.tasks['daily_tasks'][today])} tasks completed")
+        print(f"📊 Summary: {completed_tasks}/{len(today_tasks)} tasks completed")
         print(f"⏱️  Total hours today: {total_hours}")
 
     def show_categories(self):
@@ -139,57 +128,138 @@ class TesphaseTaskTracker:
     def add_milestone(self, title: str, description: str):
         """Add a milestone achievement."""
         milestone = {
-            'id': len(self.tasks['milestones']) + 1,
+            'id': self.store.milestone_count() + 1,
             'title': title,
             'description': description,
             'date': datetime.now().strftime('%Y-%m-%d'),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        self.tasks['milestones'].append(milestone)
-        self.save_tasks()
+        try:
+            self.store.add_milestone(milestone)
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return
+        self.refresh_progress()
         
         print(f"🏆 Milestone added: {title}")
 
     def show_milestones(self):
         """Show all milestones."""
-        print(f"\n🏆 Tesphase Milestones ({len(self.tasks['milestones'])} total)")
+        milestones = self.store.milestones()
+        print(f"\n🏆 Tesphase Milestones ({len(milestones)} total)")
         print("=" * 40)
         
-        if not self.tasks['milestones']:
+        if not milestones:
             print("No milestones yet. Keep working on Tesphase!")
             return
         
-        for milestone in self.tasks['milestones']:
+        for milestone in milestones:
             print(f"🏆 {milestone['title']}")
             print(f"   {milestone['description']}")
             print(f"   📅 {milestone['date']}")
             print()
 
     def show_stats(self):
-        """Show overall statistics."""
-        total_tasks = 0
-        total_completed = 0
-        
-        for day_tasks in self.tasks['daily_tasks'].values():
-            total_tasks += len(day_tasks)
-            total_completed += sum(1 for task in day_tasks if task['completed'])
+        """Show overall statistics from the store's running totals."""
+        stats = self.store.stats()
+        total_tasks, total_completed = stats['total'], stats['completed']
         
         print(f"\n📊 Tesphase Progress Statistics")
         print("=" * 35)
-        print(f"📅 Started: {self.tasks['start_date']}")
+        print(f"📅 Started: {self.store.start_date()}")
         print(f"📝 Total tasks: {total_tasks}")
         print(f"✅ Completed tasks: {total_completed}")
-        print(f"⏱️  Total hours logged: {self.tasks['total_hours']}")
-        print(f"🏆 Milestones: {len(self.tasks['milestones'])}")
+        print(f"⏱️  Total hours logged: {round(stats['hours'], 2)}")
+        print(f"🏆 Milestones: {self.store.milestone_count()}")
         
         if total_tasks > 0:
             completion_rate = (total_completed / total_tasks) * 100
             print(f"📈 Completion rate: {completion_rate:.1f}%")
+        
+        if stats['categories']:
+            print("\n⏱️  Hours by category:")
+            for category, bucket in sorted(stats['categories'].items(), key=lambda item: -item[1]['hours']):
+                category_name = self.task_categories.get(category, category)
+                print(f"  • {category_name}: {round(bucket['hours'], 2)}h ({bucket['completed']}/{bucket['total']} done)")
+
+    def show_analytics(self, weeks: int = 4):
+        """Show recent weekly hours by category, streaks and completion velocity."""
+        # NumPy is only needed here, so the other commands stay quick to start
+        from task_analytics import TaskAnalytics
+        analytics = TaskAnalytics(self.store)
+        
+        print(f"\n📈 Tesphase Analytics (last {weeks} weeks)")
+        print("=" * 40)
+        periods, categories, hours = analytics.hours_by_category('week')
+        if not periods:
+            print("No tasks logged yet!")
+            return
+        
+        for period, row in list(zip(periods, hours))[-weeks:]:
+            print(f"📅 Week of {period}: {round(row.sum(), 2)} hours")
+            for index in row.argsort()[::-1]:
+                if row[index] > 0:
+                    category_name = self.task_categories.get(categories[index], categories[index])
+                    print(f"  • {category_name}: {round(row[index], 2)}h")
+        
+        streaks = analytics.streaks()
+        velocity = analytics.completion_velocity(weeks)
+        print(f"\n🔥 Current streak: {streaks['current']} days (longest {streaks['longest']})")
+        print(f"🚀 Completed per week: {' → '.join(str(n) for n in velocity['per_week'])}")
+        if velocity['average_days_to_complete'] is not None:
+            print(f"⏳ Average days to complete: {velocity['average_days_to_complete']:.1f}")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Subcommands for non-interactive use."""
+    parser = argparse.ArgumentParser(description="Log your daily progress on Tesphase startup tasks.")
+    commands = parser.add_subparsers(dest='command')
+
+    add = commands.add_parser('add', help="add a task for today")
+    add.add_argument('category', help="category key, e.g. solar_research")
+    add.add_argument('description')
+    add.add_argument('--hours', type=float, default=0, help="hours spent (default 0)")
+
+    complete = commands.add_parser('complete', help="mark a task from any day as completed")
+    complete.add_argument('task_id', type=int)
+
+    commands.add_parser('today', help="show today's tasks")
+    commands.add_parser('stats', help="show overall statistics")
+    commands.add_parser('milestones', help="show all milestones")
+
+    analytics = commands.add_parser('analytics', help="weekly hours by category, streaks and velocity")
+    analytics.add_argument('--weeks', type=int, default=4, help="how many recent weeks to show (default 4)")
+    return parser
+
+
+def run_command(tracker: TesphaseTaskTracker, args: argparse.Namespace) -> int:
+    """Run one subcommand; returns the process exit code."""
+    if args.command == 'add':
+        tracker.add_task(args.category, args.description, args.hours)
+    elif args.command == 'complete':
+        return 0 if tracker.complete_task(args.task_id) else 1
+    elif args.command == 'today':
+        tracker.show_today_tasks()
+    elif args.command == 'stats':
+        tracker.show_stats()
+    elif args.command == 'milestones':
+        tracker.show_milestones()
+    elif args.command == 'analytics':
+        tracker.show_analytics(args.weeks)
+    return 0
+
 
 def main():
     """Main function for the task tracker."""
+    from dotenv import load_dotenv
+    load_dotenv('config.env')
+    args = build_parser().parse_args()
     tracker = TesphaseTaskTracker()
+    if args.command:
+        try:
+            sys.exit(run_command(tracker, args))
+        finally:
+            tracker.store.close()
     
     print("🌞 Welcome to Tesphase Task Tracker! 🌞")
     print("Track your daily progress on your solar energy startup")
@@ -247,6 +317,7 @@ def main():
             tracker.show_stats()
             
         elif choice == '8':
+            tracker.store.close()
             print("👋 Keep working on Tesphase! Goodbye!")
             break
             
@@ -8,24 +8,24 @@ and creates daily video summaries of your progress.
 import os
 import json
 import logging
-import schedule
+import signal
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from datetime import datetime
+from typing import Dict, Any
 import random
-import requests
 from dotenv import load_dotenv
-import cv2
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-import pyttsx3
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip, TextClip, ImageClip
-import threading
+from daily_video import prerender_daily_video
+from email_queue import EmailQueue
+from event_scheduler import EventScheduler
+from mime_builder import write_message
+from prerender import VideoPrerenderer
+from progress_service import ProgressService
+from recipients import RecipientRegistry
+from smtp_pool import get_pool
+from task_storage import open_store, storage_backend
+
+# Media libraries (OpenCV, NumPy, PIL, moviepy, pyttsx3) are imported where
+# they are used, so the email-only paths start without loading them
 
 # Load environment variables
 load_dotenv('config.env')
@@ -48,18 +48,56 @@ class TesphaseGirlfriendBot:
         self.email_password = os.getenv('EMAIL_PASSWORD')
         self.email_recipient = os.getenv('EMAIL_RECIPIENT')
         
-        # Initialize text-to-speech engine
-        self.tts_engine = pyttsx3.init()
-        self.tts_engine.setProperty('rate', 150)
-        self.tts_engine.setProperty('volume', 0.9)
+        # Everyone the reminders fan out to (defaults to EMAIL_RECIPIENT)
+        self.recipients = RecipientRegistry(os.getenv('RECIPIENTS_FILE', 'recipients.json'), self.email_recipient)
+        
+        # Video settings, handed to the pre-render worker (see video_inputs());
+        # "single_pass" encodes frames and narration in one ffmpeg run,
+        # "two_pass" uses OpenCV mp4v followed by a moviepy re-encode
+        self.video_width, self.video_height = 1280, 720
+        self.video_fps = 30
+        self.video_duration = 15  # seconds
+        self.video_pipeline = os.getenv('VIDEO_PIPELINE', 'single_pass')
+        # Worker processes rendering frame chunks in parallel (1 renders inline)
+        self.video_render_workers = int(os.getenv('VIDEO_RENDER_WORKERS', '1'))
+        # The evening video is re-encoded to fit this attachment size (after
+        # base64); past it a thumbnail is sent, linking VIDEO_BASE_URL if set
+        self.attachment_budget = int(float(os.getenv('VIDEO_ATTACHMENT_MAX_MB', '10')) * 1024 * 1024)
+        self.video_base_url = os.getenv('VIDEO_BASE_URL', '')
+        
+        # Text-to-speech settings; the engine lives in the worker's narration thread
+        self.tts_rate = 150
+        self.tts_volume = 0.9
+        
+        # Outbound emails are persisted and delivered by background workers
+        self.email_queue = EmailQueue(
+            self.email_sender, self.email_password,
+            queue_dir=os.getenv('EMAIL_QUEUE_DIR', 'outbox'),
+            workers=int(os.getenv('EMAIL_QUEUE_WORKERS', '2')),
+            max_attempts=int(os.getenv('EMAIL_MAX_ATTEMPTS', '5')),
+            rate_per_second=float(os.getenv('EMAIL_RATE_PER_SECOND', '0'))
+        )
+        
+        # Schedule; the evening video is pre-rendered and fitted to the
+        # attachment budget in a worker process, ready by the evening send slot
+        self.load_schedule_times()
+        self.scheduler_mode = os.getenv('SCHEDULER_MODE', 'event')
+        self.scheduler = None
+        self.prerenderer = VideoPrerenderer(prerender_daily_video)
         
         # Create directories
         self.create_directories()
         
-        # Load progress data
+        # Load progress data (from the task database unless TASK_STORAGE=json)
         self.progress_file = 'tesphase_progress.json'
+        self.progress_store = None
+        if storage_backend() == 'sqlite':
+            self.progress_store = open_store('sqlite')
         self.load_progress()
         
+        # Today's task numbers, precomputed by the task tracker on every change
+        self.progress_service = ProgressService()
+        
         # Motivational messages
         self.morning_messages = [
             f"Good morning, sunshine! ☀️ Time to make Tesphase shine brighter than ever! Your solar energy startup is going to change the world, and I believe in you! 💚",
@@ -84,11 +122,16 @@ class TesphaseGirlfriendBot:
             os.makedirs(directory, exist_ok=True)
 
     def load_progress(self):
-        """Load progress data from JSON file."""
+        """Load progress data from the JSON file or the task database."""
         try:
-            if os.path.exists(self.progress_file):
+            saved = None
+            if self.progress_store:
+                saved = self.progress_store.load_progress()
+            elif os.path.exists(self.progress_file):
                 with open(self.progress_file, 'r') as f:
-                    self.progress_data = json.load(f)
+                    saved = json.load(f)
+            if saved is not None:
+                self.progress_data = saved
             else:
                 self.progress_data = {
                     'start_date': datetime.now().strftime('%Y-%m-%d'),
@@ -109,51 +152,72 @@ class TesphaseGirlfriendBot:
             }
 
     def save_progress(self):
-        """Save progress data to JSON file."""
+        """Save progress data to the JSON file or the task database."""
         try:
+            if self.progress_store:
+                self.progress_store.save_progress(self.progress_data)
+                return
             with open(self.progress_file, 'w') as f:
                 json.dump(self.progress_data, f, indent=2)
         except Exception as e:
             logging.error(f"Error saving progress: {e}")
 
-    def send_email_reminder(self, subject: str, message: str, attachment_path: str = None):
-        """Send email reminder with optional attachment."""
-        if not all([self.email_sender, self.email_password, self.email_recipient]):
+    def sync_progress(self, digest: Dict[str, Any]):
+        """Copy the tracker's numbers from the daily digest into progress_data."""
+        self.progress_data['start_date'] = digest['start_date']
+        self.progress_data['total_work_hours'] = digest['total_hours']
+        self.progress_data['milestones'] = digest['milestones']
+        # One summary per day, replaced if the evening job runs again
+        daily = [entry for entry in self.progress_data.get('daily_tasks', []) if entry.get('date') != digest['date']]
+        daily.append({key: digest[key] for key in ('date', 'tasks', 'completed', 'hours')})
+        self.progress_data['daily_tasks'] = daily
+        self.save_progress()
+
+    def progress_summary(self, digest: Dict[str, Any]) -> str:
+        """One or two sentences about today's real progress."""
+        if digest['tasks']:
+            summary = (f"Today you logged {digest['tasks']} Tesphase task{'s' if digest['tasks'] != 1 else ''}, "
+                       f"finished {digest['completed']} and put in {digest['hours']:g} hours.")
+        else:
+            summary = "You haven't logged any Tesphase tasks today yet."
+        if digest['total_tasks']:
+            summary += (f" Since {digest['start_date']} you've completed {digest['total_completed']} of "
+                        f"{digest['total_tasks']} tasks and logged {digest['total_hours']:,.1f} hours.")
+        return summary
+
+    def send_email_reminder(self, subject: str, message: str, attachment_path: str = None, queued: bool = True):
+        """Send email reminder with optional attachment to every active recipient.
+
+        The message is built once on disk and shared by all recipients. By
+        default it is handed to the outbound queue and this returns as soon as
+        it is persisted; pass queued=False to deliver immediately.
+        """
+        recipients = self.recipients.active()
+        if not all([self.email_sender, self.email_password, recipients]):
             logging.error("Email configuration incomplete. Please check your .env file.")
             return False
 
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.email_sender
-            msg['To'] = self.email_recipient
-            msg['Subject'] = subject
+            # Build the message on disk once; the attachment is base64-encoded in
+            # chunks into a reusable part, and each recipient's To header is
+            # added at send time
+            message_path = write_message(
+                self.email_queue.draft_path(), self.email_sender, subject, message,
+                attachment_path, parts_dir=self.email_queue.parts_dir
+            )
+            if queued:
+                self.email_queue.enqueue_batch(recipients, subject=subject, message_path=message_path)
+                return True
 
-            # Add body
-            msg.attach(MIMEText(message, 'html'))
-
-            # Add attachment if provided
-            if attachment_path and os.path.exists(attachment_path):
-                with open(attachment_path, "rb") as attachment:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(attachment.read())
-                
-                encoders.encode_base64(part)
-                part.add_header(
-                    'Content-Disposition',
-                    f'attachment; filename= {os.path.basename(attachment_path)}'
-                )
-                msg.attach(part)
-
-            # Send email
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(self.email_sender, self.email_password)
-            text = msg.as_string()
-            server.sendmail(self.email_sender, self.email_recipient, text)
-            server.quit()
+            # Send email over pooled, already logged-in sessions
+            pool = get_pool(self.email_sender, self.email_password)
+            try:
+                for recipient in recipients:
+                    pool.send_file(self.email_sender, recipient, message_path, to_header=recipient)
+            finally:
+                os.remove(message_path)
 
-            logging.info(f"Email sent successfully: {subject}")
+            logging.info(f"Email sent successfully: {subject} ({len(recipients)} recipient(s))")
             return True
 
         except Exception as e:
@@ -199,32 +263,16 @@ class TesphaseGirlfriendBot:
         self.progress_data['last_reminder'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self.save_progress()
 
-    def create_daily_video(self):
-        """Create a daily video summary about Tesphase progress."""
-        try:
-            # Create video content
-            video_script = self.generate_video_script()
-            
-            # Create video with text overlay
-            video_path = self.create_video_with_text(video_script)
-            
-            # Add audio narration
-            final_video_path = self.add_audio_narration(video_path, video_script)
-            
-            logging.info(f"Daily video created: {final_video_path}")
-            return final_video_path
-            
-        except Exception as e:
-            logging.error(f"Error creating daily video: {e}")
-            return None
-
     def generate_video_script(self):
         """Generate script for daily video."""
         today = datetime.now().strftime('%B %d, %Y')
+        progress = self.progress_summary(self.progress_service.today())
         
         script = f"""
         Hey babe! It's {today} and I wanted to remind you about Tesphase, your amazing solar energy startup!
         
+        {progress}
+        
         Remember why you started this journey - to make the world a greener place, one solar panel at a time.
         
         Today's focus areas for Tesphase:
@@ -241,107 +289,74 @@ class TesphaseGirlfriendBot:
         
         return script
 
-    def create_video_with_text(self, script: str):
-        """Create video with text overlay."""
-        # Create a simple video with text
-        width, height = 1280, 720
-        duration = 15  # seconds
-        
-        # Create frames
-        frames = []
-        fps = 30
-        
-        for i in range(duration * fps):
-            # Create background
-            frame = np.zeros((height, width, 3), dtype=np.uint8)
-            
-            # Add gradient background
-            for y in range(height):
-                color = int(255 * (1 - y / height))
-                frame[y, :] = [0, color//2, color//2]  # Green gradient
-            
-            # Add text overlay
-            frame_pil = Image.fromarray(frame)
-            draw = ImageDraw.Draw(frame_pil)
-            
-            # Try to use a default font, fallback to basic if not available
-            try:
-                font = ImageFont.truetype("arial.ttf", 40)
-            except:
-                font = ImageFont.load_default()
-            
-            # Add title
-            title = f"Tesphase Daily Reminder - {datetime.now().strftime('%B %d, %Y')}"
-            draw.text((width//2 - 300, 50), title, fill=(255, 255, 255), font=font)
-            
-            # Add script text (simplified for video)
-            lines = [
-                "Hey babe! Time to work on Tesphase!",
-                "",
-                "Your solar energy startup needs you!",
-                "",
-                "Focus areas for today:",
-                "• Solar panel research",
-                "• Market analysis", 
-                "• Partnership development",
-                "",
-                "You've got this! 💚"
-            ]
-            
-            y_offset = 150
-            for line in lines:
-                draw.text((width//2 - 200, y_offset), line, fill=(255, 255, 255), font=font)
-                y_offset += 50
-            
-            frames.append(np.array(frame_pil))
-        
-        # Save video
-        video_path = f"videos/tesphase_reminder_{datetime.now().strftime('%Y%m%d')}.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(video_path, fourcc, fps, (width, height))
-        
-        for frame in frames:
-            out.write(frame)
-        
-        out.release()
-        return video_path
+    def video_overlay(self):
+        """Return the title, text lines and today's progress line drawn on the daily video."""
+        # Add title
+        title = f"Tesphase Daily Reminder - {datetime.now().strftime('%B %d, %Y')}"
+        digest = self.progress_service.today()
+        progress = f"Today: {digest['completed']}/{digest['tasks']} tasks done, {digest['hours']:g}h"
+        
+        # Add script text (simplified for video)
+        lines = [
+            "Hey babe! Time to work on Tesphase!",
+            "",
+            "Your solar energy startup needs you!",
+            "",
+            "Focus areas for today:",
+            "• Solar panel research",
+            "• Market analysis", 
+            "• Partnership development",
+            "",
+            "You've got this! 💚"
+        ]
+        return title, lines, progress
 
-    def add_audio_narration(self, video_path: str, script: str):
-        """Add audio narration to video."""
-        try:
-            # Generate audio from script
-            audio_path = f"audio/narration_{datetime.now().strftime('%Y%m%d')}.mp3"
-            
-            # Use text-to-speech
-            self.tts_engine.save_to_file(script, audio_path)
-            self.tts_engine.runAndWait()
-            
-            # Combine video and audio
-            video_clip = VideoFileClip(video_path)
-            audio_clip = AudioFileClip(audio_path)
-            
-            # Ensure audio matches video duration
-            if audio_clip.duration > video_clip.duration:
-                audio_clip = audio_clip.subclip(0, video_clip.duration)
-            
-            final_video = video_clip.set_audio(audio_clip)
-            final_path = f"videos/tesphase_final_{datetime.now().strftime('%Y%m%d')}.mp4"
-            final_video.write_videofile(final_path, codec='libx264')
-            
-            # Clean up
-            video_clip.close()
-            audio_clip.close()
-            final_video.close()
-            
-            return final_path
-            
-        except Exception as e:
-            logging.error(f"Error adding audio narration: {e}")
-            return video_path
+    def video_inputs(self):
+        """Everything today's video depends on, as plain values for DailyVideo."""
+        title, lines, progress = self.video_overlay()
+        return {
+            'script': self.generate_video_script(),
+            'title': title,
+            'lines': lines,
+            'progress': progress,
+            'width': self.video_width,
+            'height': self.video_height,
+            'fps': self.video_fps,
+            'duration': self.video_duration,
+            'pipeline': self.video_pipeline,
+            'render_workers': self.video_render_workers,
+            'attachment_budget': self.attachment_budget,
+            'video_base_url': self.video_base_url,
+            # Content-addressed cache for videos, narration and pre-rendered layers
+            'cache_dir': os.getenv('RENDER_CACHE_DIR', 'cache'),
+            'cache_max_bytes': int(os.getenv('RENDER_CACHE_MAX_MB', '500')) * 1024 * 1024,
+            'tts_rate': self.tts_rate,
+            'tts_volume': self.tts_volume
+        }
+
+    def start_video_prerender(self):
+        """Start rendering today's video in the background before the evening send."""
+        hour, minute = map(int, self.evening_time.split(':'))
+        deadline = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # The worker gets only the render inputs, not the bot
+        self.prerenderer.start(deadline, self.video_inputs())
 
     def send_evening_summary(self):
         """Send evening summary with video attachment."""
-        video_path = self.create_daily_video()
+        # Only attach what the pre-render produced, already fitted to the
+        # attachment budget; never render or re-encode on the scheduler thread
+        prepared = self.prerenderer.collect()
+        
+        # Today's numbers come from the tracker's precomputed digest
+        digest = self.progress_service.today()
+        self.sync_progress(digest)
+        progress = self.progress_summary(digest)
+        
+        if prepared:
+            attachment_path, summary = prepared
+        else:
+            attachment_path = None
+            summary = "Your video reminder wasn't ready in time today, but I'm still so proud of everything you're doing for Tesphase!"
         
         message = random.choice(self.reminder_messages)
         
@@ -354,7 +369,8 @@ class TesphaseGirlfriendBot:
                 
                 <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
                     <h3 style="color: #2E8B57;">📊 Today's Progress Summary:</h3>
-                    <p style="color: #555;">I've created a daily video reminder for you! Check the attachment for your personalized Tesphase motivation video.</p>
+                    <p style="color: #555;">{progress}</p>
+                    <p style="color: #555;">{summary}</p>
                 </div>
                 
                 <div style="text-align: center; margin-top: 30px;">
@@ -368,30 +384,75 @@ class TesphaseGirlfriendBot:
         
         subject = f"🌅 Evening Update: Your Tesphase Journey Continues! 💚"
         
-        if video_path:
-            self.send_email_reminder(subject, html_message, video_path)
+        if attachment_path:
+            self.send_email_reminder(subject, html_message, attachment_path)
         else:
             self.send_email_reminder(subject, html_message)
 
+    def load_schedule_times(self):
+        """Read the daily schedule (HH:MM) from the environment."""
+        self.morning_time = os.getenv('MORNING_TIME', '08:00')
+        self.midday_time = os.getenv('MIDDAY_TIME', '14:00')
+        self.evening_time = os.getenv('EVENING_TIME', '18:00')
+        self.prerender_time = os.getenv('PRERENDER_TIME', '17:00')
+
+    def scheduled_jobs(self):
+        """Return (name, time, job) for every scheduled task."""
+        return [
+            # Morning reminder at 8:00 AM
+            ('morning_reminder', self.morning_time, self.create_morning_reminder),
+            # Mid-day reminder at 2:00 PM
+            ('midday_reminder', self.midday_time, self.create_morning_reminder),
+            # Evening video is rendered in the background ahead of the send slot
+            ('video_prerender', self.prerender_time, self.start_video_prerender),
+            # Evening summary at 6:00 PM
+            ('evening_summary', self.evening_time, self.send_evening_summary),
+        ]
+
+    def reload_schedule(self):
+        """Re-read schedule times from config.env and move any jobs that changed."""
+        load_dotenv('config.env', override=True)
+        self.load_schedule_times()
+        if self.scheduler:
+            for name, at, _ in self.scheduled_jobs():
+                self.scheduler.reschedule(name, at)
+
     def run_scheduler(self):
         """Run the scheduled tasks."""
-        # Morning reminder at 8:00 AM
-        schedule.every().day.at("08:00").do(self.create_morning_reminder)
+        # Started between the pre-render and send slots: render right away
+        now = datetime.now().strftime('%H:%M')
+        if self.prerender_time <= now < self.evening_time:
+            self.start_video_prerender()
         
-        # Evening summary at 6:00 PM
-        schedule.every().day.at("18:00").do(self.send_evening_summary)
-        
-        # Mid-day reminder at 2:00 PM
-        schedule.every().day.at("14:00").do(self.create_morning_reminder)
+        # Deliver anything left queued from a previous run
+        self.email_queue.start()
         
         logging.info("Tesphase Girlfriend Bot started! Scheduling tasks...")
-        logging.info("Morning reminder: 8:00 AM")
-        logging.info("Mid-day reminder: 2:00 PM") 
-        logging.info("Evening summary: 6:00 PM")
+        logging.info(f"Morning reminder: {self.morning_time}")
+        logging.info(f"Mid-day reminder: {self.midday_time}") 
+        logging.info(f"Video pre-render: {self.prerender_time}")
+        logging.info(f"Evening summary: {self.evening_time}")
+        
+        if self.scheduler_mode == 'polling':
+            import schedule
+            for _, at, job in self.scheduled_jobs():
+                schedule.every().day.at(at).do(job)
+            while True:
+                schedule.run_pending()
+                time.sleep(60)  # Check every minute
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        # Sleep until the next job is due; edits to config.env reload the schedule
+        # (polled every CONFIG_POLL_SECONDS, or right away on SIGHUP where available).
+        # Jobs run in a bounded thread pool, one instance of each at a time
+        self.scheduler = EventScheduler(max_workers=int(os.getenv('SCHEDULER_WORKERS', '4')))
+        stall_after = float(os.getenv('JOB_STALL_SECONDS', '900'))
+        for name, at, job in self.scheduled_jobs():
+            self.scheduler.every_day_at(at, job, name, max_instances=1, stall_after=stall_after)
+        self.scheduler.watch_file('config.env', self.reload_schedule, float(os.getenv('CONFIG_POLL_SECONDS', '30')))
+        if hasattr(signal, 'SIGHUP'):
+            # The handler only queues the reload; the scheduler loop runs it
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.scheduler.call_soon(self.reload_schedule))
+        self.scheduler.run()
 
     def test_email(self):
         """Test email functionality."""
@@ -413,7 +474,7 @@ class TesphaseGirlfriendBot:
         </html>
         """
         
-        success = self.send_email_reminder(subject, message)
+        success = self.send_email_reminder(subject, message, queued=False)
         if success:
             print("✅ Test email sent successfully!")
         else:
@@ -442,6 +503,12 @@ def main():
         bot.run_scheduler()
     except KeyboardInterrupt:
         print("\n👋 Tesphase Girlfriend Bot stopped. Goodbye!")
+    finally:
+        if bot.scheduler:
+            bot.scheduler.stop()
+            logging.info(f"Scheduler lateness metrics: {bot.scheduler.metrics()}")
+        bot.prerenderer.stop()
+        bot.email_queue.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
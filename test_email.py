@@ -8,6 +8,7 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+from smtp_pool import get_pool
 
 # Load environment variables
 load_dotenv('config.env')
@@ -49,19 +50,14 @@ def test_email_connection():
         
         msg.attach(MIMEText(body, 'plain'))
         
-        print("📧 Connecting to Gmail SMTP...")
+        pool = get_pool(email_sender, email_password)
+        print(f"📧 Connecting to {pool.host}:{pool.port} and logging in...")
         
-        # Connect to Gmail SMTP
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        
-        print("🔐 Attempting login...")
-        server.login(email_sender, email_password)
-        
-        print("📤 Sending email...")
-        text = msg.as_string()
-        server.sendmail(email_sender, email_recipient, text)
-        server.quit()
+        # Checking out a session connects, runs STARTTLS and logs in
+        with pool.connection() as server:
+            print("📤 Sending email...")
+            text = msg.as_string()
+            server.sendmail(email_sender, email_recipient, text)
         
         print("✅ Email sent successfully!")
         print(f"📧 Check your inbox at: {email_recipient}")
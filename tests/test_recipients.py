@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Tests for the recipient registry picking up edits to recipients.json."""
+
+import json
+import os
+
+from recipients import RecipientRegistry
+
+
+def write_recipients(path, emails):
+    with open(path, 'w') as f:
+        json.dump({'recipients': [{'email': email, 'name': '', 'active': True} for email in emails]}, f)
+
+
+def test_edits_to_the_file_reach_a_running_registry(tmp_path):
+    recipients_file = str(tmp_path / 'recipients.json')
+    registry = RecipientRegistry(recipients_file, 'default@example.com')
+    assert registry.active() == ['default@example.com']
+
+    write_recipients(recipients_file, ['a@example.com', 'b@example.com'])
+    assert registry.active() == ['a@example.com', 'b@example.com']
+
+    # Another process (python recipients.py remove) deactivates one
+    RecipientRegistry(recipients_file).remove('a@example.com')
+    assert registry.active() == ['b@example.com']
+
+    os.remove(recipients_file)
+    assert registry.active() == ['default@example.com']
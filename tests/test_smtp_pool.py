@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Tests for the SMTP pool and email queue against a local aiosmtpd server."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+import smtp_pool
+from email_queue import EmailQueue
+from smtp_pool import SMTPPool
+
+
+class RecordingHandler:
+    """Keeps every message the server accepts, with the client port it came from."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append({'port': session.peer[1], 'to': envelope.rcpt_tos,
+                              'content': envelope.content.decode()})
+        return '250 OK'
+
+    def connections(self):
+        return {message['port'] for message in self.messages}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def message_file(tmp_path):
+    path = tmp_path / 'message.eml'
+    path.write_text("Subject: Tesphase test\n\n.leading dot\nHello!\n")
+    return str(path)
+
+
+def new_pool(controller, **kwargs):
+    return SMTPPool(controller.hostname, controller.port, starttls=False, **kwargs)
+
+
+def test_sessions_are_reused(smtp_server, message_file):
+    controller, handler = smtp_server
+    pool = new_pool(controller)
+    for i in range(5):
+        pool.send_file('bot@example.com', f"user{i}@example.com", message_file, to_header=f"user{i}@example.com")
+    pool.close()
+
+    assert len(handler.messages) == 5
+    assert len(handler.connections()) == 1
+    assert handler.messages[0]['content'].startswith("To: user0@example.com\r\nSubject: Tesphase test")
+    # Dot-stuffing is undone by the server
+    assert "\r\n.leading dot\r\n" in handler.messages[0]['content']
+
+
+def test_dropped_session_is_retried_on_a_new_connection(message_file):
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    # A long keepalive trusts the idle session without a NOOP, so the send hits the drop
+    pool = new_pool(controller, keepalive=3600)
+    pool.send_file('bot@example.com', 'user@example.com', message_file)
+
+    # Restarting the server drops the pooled session
+    controller.stop()
+    controller = aiosmtpd_controller.Controller(handler, hostname=controller.hostname, port=controller.port)
+    controller.start()
+    try:
+        pool.send_file('bot@example.com', 'user@example.com', message_file)
+    finally:
+        pool.close()
+        controller.stop()
+
+    assert len(handler.messages) == 2
+    assert len(handler.connections()) == 2
+
+
+def test_sends_wait_for_a_ping_instead_of_opening_another_session(smtp_server, message_file, monkeypatch):
+    controller, handler = smtp_server
+    pool = new_pool(controller, size=1)
+    pool.send_file('bot@example.com', 'user@example.com', message_file)
+
+    # Hold the ping on the only (idle) session while a send comes in
+    pinging, finish_ping = threading.Event(), threading.Event()
+    is_alive = SMTPPool._is_alive
+
+    def slow_is_alive(server):
+        pinging.set()
+        finish_ping.wait(5)
+        return is_alive(server)
+
+    monkeypatch.setattr(SMTPPool, '_is_alive', staticmethod(slow_is_alive))
+    pinger = threading.Thread(target=pool.ping_idle)
+    pinger.start()
+    pinging.wait(5)
+    sender = threading.Thread(target=pool.send_file, args=('bot@example.com', 'user@example.com', message_file))
+    sender.start()
+    time.sleep(0.2)
+    finish_ping.set()
+    pinger.join()
+    sender.join()
+    pool.close()
+
+    assert len(handler.messages) == 2
+    assert len(handler.connections()) == 1
+
+
+def test_queue_delivers_a_batch_through_the_pool(smtp_server, message_file, tmp_path, monkeypatch):
+    controller, handler = smtp_server
+    monkeypatch.setenv('SMTP_HOST', controller.hostname)
+    monkeypatch.setenv('SMTP_PORT', str(controller.port))
+    monkeypatch.setenv('SMTP_STARTTLS', 'false')
+    monkeypatch.setattr(smtp_pool, '_pools', {})
+
+    email_queue = EmailQueue('bot@example.com', None, queue_dir=str(tmp_path / 'outbox'), base_delay=0.1)
+    # The first attempt fails as if the server were unreachable, and is retried
+    send_file = SMTPPool.send_file
+    failures = []
+
+    def flaky_send_file(pool, *args, **kwargs):
+        if not failures:
+            failures.append(args)
+            raise ConnectionRefusedError("connection refused")
+        return send_file(pool, *args, **kwargs)
+
+    monkeypatch.setattr(SMTPPool, 'send_file', flaky_send_file)
+    recipients = [f"user{i}@example.com" for i in range(5)]
+    email_queue.enqueue_batch(recipients, subject='Tesphase test', message_path=message_file)
+    try:
+        deadline = time.monotonic() + 10
+        while email_queue.pending_count() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        email_queue.stop()
+        smtp_pool.close_all()
+
+    assert len(failures) == 1
+    assert sorted(to for message in handler.messages for to in message['to']) == recipients
+    assert len(handler.connections()) <= email_queue.workers
+    assert sorted(p.name for p in (tmp_path / 'outbox' / 'pending').iterdir()) == []
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Tests for the task storage backends shared by several processes."""
+
+import multiprocessing
+
+from task_storage import JournalStore, SQLiteStore, open_store
+
+DAY = '2026-10-18'
+
+
+def new_task(description):
+    return {'category': 'solar_research', 'description': description, 'hours': 1, 'completed': False}
+
+
+def add_tasks(snapshot_file, name, count):
+    store = JournalStore(snapshot_file, compact_every=7)
+    store.load()
+    for i in range(count):
+        store.add_task(DAY, new_task(f"{name}-{i}"))
+    store.close()
+
+
+def reload(snapshot_file):
+    store = JournalStore(snapshot_file)
+    store.load()
+    return store
+
+
+def test_two_stores_loaded_from_one_file_keep_both_tasks(tmp_path):
+    snapshot_file = str(tmp_path / 'tasks.json')
+    first, second = reload(snapshot_file), reload(snapshot_file)
+    first_task, second_task = new_task('first'), new_task('second')
+    first.add_task(DAY, first_task)
+    second.add_task(DAY, second_task)
+
+    assert first_task['id'] != second_task['id']
+    store = reload(snapshot_file)
+    assert sorted(task['description'] for _, task in store.iter_tasks()) == ['first', 'second']
+    # Either store can complete a task the other one added
+    assert first.complete_task(second_task['id'], f"{DAY} 18:00:00")['description'] == 'second'
+    assert reload(snapshot_file).day_stats(DAY)['completed'] == 1
+
+
+def test_stale_store_compacting_keeps_other_writers_lines(tmp_path):
+    snapshot_file = str(tmp_path / 'tasks.json')
+    stale, writer = reload(snapshot_file), reload(snapshot_file)
+    writer.add_task(DAY, new_task('appended'))
+    stale.compact()
+
+    store = reload(snapshot_file)
+    assert [task['description'] for _, task in store.iter_tasks()] == ['appended']
+    assert store.verify_stats()
+
+
+def test_concurrent_writer_processes_get_unique_ids(tmp_path):
+    snapshot_file = str(tmp_path / 'tasks.json')
+    reload(snapshot_file).close()
+    writers = [multiprocessing.Process(target=add_tasks, args=(snapshot_file, name, 40)) for name in 'ab']
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+        assert writer.exitcode == 0
+
+    store = reload(snapshot_file)
+    ids = [task['id'] for _, task in store.iter_tasks()]
+    assert len(ids) == 80
+    assert sorted(ids) == list(range(1, 81))
+    assert store.stats()['total'] == 80
+    assert store.verify_stats()
+
+
+def test_bulk_import_moves_the_change_marker(tmp_path):
+    snapshot_file = str(tmp_path / 'tasks.json')
+    store = reload(snapshot_file)
+    before = store.change_marker()
+    assert store.add_tasks((DAY, new_task(f"imported-{i}")) for i in range(3)) == 3
+
+    assert store.change_marker() > before
+    assert reload(snapshot_file).change_marker() == store.change_marker()
+
+
+def test_default_backend_moves_an_existing_json_store_into_sqlite(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('TASK_STORAGE', raising=False)
+    monkeypatch.delenv('TASK_DB', raising=False)
+    monkeypatch.delenv('TASKS_FILE', raising=False)
+    json_store = reload('tesphase_tasks.json')
+    task = new_task('from json')
+    json_store.add_task(DAY, task)
+    json_store.close()
+    (tmp_path / 'tesphase_progress.json').write_text('{"last_reminder": "yesterday"}')
+
+    store = open_store()
+    assert isinstance(store, SQLiteStore)
+    assert [t['description'] for t in store.tasks_for_day(DAY)] == ['from json']
+    assert store.complete_task(task['id'], f"{DAY} 18:00:00")
+    assert store.load_progress() == {'last_reminder': 'yesterday'}
+    store.close()
+    # Later opens use the database as it is
+    assert open_store().day_stats(DAY)['completed'] == 1
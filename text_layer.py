@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tesphase Text Layer
+Font resolution and cached text rasterization for the video overlays.
+
+Fonts are looked up once along a configurable search path (FONT_PATH, then
+the usual system font directories) by the preferred names in VIDEO_FONT, and
+loaded fonts are kept per size. Each line of text is rasterized once into an
+alpha mask keyed by (font, size, text); drawing it again is a NumPy alpha
+blend of the cached mask, with no FreeType or PIL drawing involved.
+"""
+
+import os
+import sys
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+DEFAULT_FONTS = 'arial.ttf,DejaVuSans.ttf,LiberationSans-Regular.ttf,Helvetica.ttc'
+FONT_FILE_TYPES = ('.ttf', '.ttc', '.otf')
+
+
+def font_search_path() -> List[str]:
+    """Directories searched for fonts: FONT_PATH entries first, then the system font folders."""
+    configured = [path for path in os.getenv('FONT_PATH', '').split(os.pathsep) if path]
+    if sys.platform == 'win32':
+        system = [os.path.join(os.getenv('WINDIR', r'C:\Windows'), 'Fonts')]
+    elif sys.platform == 'darwin':
+        system = ['/System/Library/Fonts', '/Library/Fonts', os.path.expanduser('~/Library/Fonts')]
+    else:
+        system = ['/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.local/share/fonts'),
+                  os.path.expanduser('~/.fonts')]
+    return configured + system
+
+
+@lru_cache(maxsize=None)
+def _find_font(names: Tuple[str, ...], search_path: Tuple[str, ...]) -> Optional[str]:
+    wanted = {name.lower(): rank for rank, name in enumerate(names)}
+    best, best_rank = None, len(names)
+    for directory in search_path:
+        for root, _, files in os.walk(directory):
+            for file in files:
+                rank = wanted.get(file.lower(), best_rank)
+                if rank < best_rank and file.lower().endswith(FONT_FILE_TYPES):
+                    best, best_rank = os.path.join(root, file), rank
+                    if rank == 0:
+                        return best
+    return best
+
+
+def find_font(names: Optional[List[str]] = None) -> Optional[str]:
+    """Path of the first available font in `names` (default VIDEO_FONT), or None.
+
+    Entries may also be absolute paths. The search path is walked once per
+    distinct request and the result is remembered. File names match
+    case-insensitively.
+    """
+    names = names or [name.strip() for name in os.getenv('VIDEO_FONT', DEFAULT_FONTS).split(',') if name.strip()]
+    for name in names:
+        if os.path.isfile(name):
+            return name
+    return _find_font(tuple(names), tuple(font_search_path()))
+
+
+@lru_cache(maxsize=None)
+def load_font(size: int = 40):
+    """Load the overlay font at `size`, falling back to PIL's built-in font."""
+    path = find_font()
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
+    try:
+        # Pillow 10.1+ can scale its built-in font
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def font_id(font) -> str:
+    """Identify a loaded font for cache keys (file path and size)."""
+    path = getattr(font, 'path', None)
+    return f"{path if isinstance(path, str) else 'default'}:{getattr(font, 'size', 0)}"
+
+
+class TextRenderer:
+    """Rasterizes lines of text once and alpha-blends the cached masks into frames."""
+
+    def __init__(self, max_lines: int = 512):
+        self.max_lines = max_lines
+        self.lines: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, Tuple[int, int]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def line_mask(self, text: str, font) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Return the line's alpha mask and its offset from the drawing origin."""
+        key = (font_id(font), text)
+        cached = self.lines.get(key)
+        if cached is not None:
+            self.lines.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        left, top, right, bottom = font.getbbox(text)
+        mask = Image.new('L', (max(right - left, 1), max(bottom - top, 1)))
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+        cached = (np.asarray(mask), (left, top))
+        self.lines[key] = cached
+        if len(self.lines) > self.max_lines:
+            self.lines.popitem(last=False)
+        return cached
+
+    def draw(self, frame: np.ndarray, xy: Tuple[int, int], text: str, font,
+             fill: Tuple[int, int, int] = (255, 255, 255)):
+        """Blend `text` into `frame` in place at `xy`, like ImageDraw.text()."""
+        mask, (dx, dy) = self.line_mask(text, font)
+        x, y = xy[0] + dx, xy[1] + dy
+        height, width = frame.shape[:2]
+        # Clip the mask to the frame
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + mask.shape[1], width), min(y + mask.shape[0], height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        alpha = mask[y0 - y:y1 - y, x0 - x:x1 - x, None].astype(np.uint16)
+        region = frame[y0:y1, x0:x1]
+        color = np.array(fill, dtype=np.uint16)
+        region[:] = (region * (255 - alpha) + color * alpha + 127) // 255
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tesphase Output Profiles
+Fits the daily video into an email attachment budget.
+
+A ladder of output profiles (resolution, frame rate, CRF and a bitrate
+floor) is tried from best to smallest. The bitrate the budget allows is
+worked out from the video's duration, with the 4/3 base64 inflation of an
+email attachment taken into account, and used as a rate cap so the first
+encode usually fits. If even the smallest profile can't meet the budget,
+the caller falls back to a thumbnail preview (and a link, if configured).
+"""
+
+import logging
+import math
+import os
+import re
+import subprocess
+from typing import List, Optional, Tuple
+
+from video_renderer import find_ffmpeg, vfr_options
+
+AUDIO_KBPS = 64
+# Room for the MP4 container and bitrate overshoot
+SIZE_HEADROOM = 0.9
+
+
+class OutputProfile:
+    """Resolution, frame rate and quality settings for one size class of video."""
+
+    def __init__(self, name: str, width: int, height: int, fps: int, crf: int, min_kbps: int):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.crf = crf
+        # Below this video bitrate the resolution isn't worth keeping
+        self.min_kbps = min_kbps
+
+    def __repr__(self):
+        return f"OutputProfile({self.name}: {self.width}x{self.height}@{self.fps} crf {self.crf})"
+
+
+PROFILES: List[OutputProfile] = [
+    OutputProfile('720p', 1280, 720, 30, 23, 800),
+    OutputProfile('540p', 960, 540, 30, 26, 400),
+    OutputProfile('360p', 640, 360, 24, 28, 200),
+    OutputProfile('240p', 426, 240, 15, 30, 0),
+]
+
+
+def attachment_size(path: str) -> int:
+    """Bytes the file takes once base64-encoded into an email (76-character lines)."""
+    return math.ceil(os.path.getsize(path) / 57) * 77
+
+
+def _ffmpeg() -> str:
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found; set FFMPEG_BINARY or install imageio-ffmpeg")
+    return ffmpeg
+
+
+def probe_video(path: str) -> Tuple[float, int, int, float]:
+    """Return (duration in seconds, width, height, average fps) from ffmpeg's stream info."""
+    result = subprocess.run([_ffmpeg(), '-hide_banner', '-i', path], capture_output=True)
+    info = result.stderr.decode(errors='replace')
+    duration = re.search(r'Duration: (\d+):(\d+):([\d.]+)', info)
+    stream = re.search(r'Stream #.*Video: .*', info)
+    size = stream and re.search(r'\b(\d{2,5})x(\d{2,5})\b', stream.group(0))
+    if not duration or not size:
+        raise ValueError(f"Can't read video information from {path}")
+    hours, minutes, seconds = duration.groups()
+    fps = re.search(r'([\d.]+) fps', stream.group(0))
+    return (int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+            int(size.group(1)), int(size.group(2)), float(fps.group(1)) if fps else 0.0)
+
+
+def transcode(source: str, output_path: str, profile: OutputProfile, source_fps: float,
+              max_kbps: Optional[int] = None) -> str:
+    """Re-encode `source` at the profile's size and quality, capped at max_kbps if given."""
+    filters = [f"scale={profile.width}:{profile.height}:force_original_aspect_ratio=decrease",
+               "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+    # Held stills have a low average frame rate; only resample real high-rate video
+    if source_fps > profile.fps:
+        filters.append(f"fps={profile.fps}")
+    ffmpeg = _ffmpeg()
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-i', source, '-map', '0:v:0', '-map', '0:a?',
+               '-vf', ','.join(filters), '-c:v', 'libx264', '-crf', str(profile.crf),
+               '-pix_fmt', 'yuv420p', *vfr_options(ffmpeg), '-enc_time_base', '1/90000']
+    if max_kbps:
+        command += ['-maxrate', f"{max_kbps}k", '-bufsize', f"{2 * max_kbps}k"]
+    command += ['-c:a', 'aac', '-b:a', f"{AUDIO_KBPS}k", '-movflags', '+faststart', output_path]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {result.stderr.decode(errors='replace').strip()}")
+    return output_path
+
+
+def fit_video(source: str, budget_bytes: int) -> Optional[Tuple[str, Optional[OutputProfile]]]:
+    """Return (path, profile) of a version of `source` whose attachment fits the budget.
+
+    The source itself is returned (with profile None) when it already fits;
+    otherwise the profiles are tried from best to smallest, skipping any
+    larger than the source or whose bitrate floor the budget can't pay for,
+    and tightening the rate cap after each encode that overshoots.
+    Returns None if nothing fits.
+    """
+    if attachment_size(source) <= budget_bytes:
+        return source, None
+
+    duration, width, height, fps = probe_video(source)
+    # Raw bytes the encoded attachment may hold, spread over the video
+    raw_budget = budget_bytes * 57 / 77 * SIZE_HEADROOM
+    video_kbps = int(raw_budget * 8 / 1000 / max(duration, 0.1)) - AUDIO_KBPS
+    base, _ = os.path.splitext(source)
+
+    for profile in PROFILES:
+        if profile.width > width or profile.height > height or video_kbps < profile.min_kbps:
+            continue
+        if video_kbps <= 0:
+            break
+        output_path = f"{base}_{profile.name}.mp4"
+        transcode(source, output_path, profile, fps, video_kbps)
+        size = attachment_size(output_path)
+        if size <= budget_bytes:
+            logging.info(f"Video fitted to {profile.name}: {size / 1024:.0f} KB attached (budget {budget_bytes / 1024:.0f} KB)")
+            return output_path, profile
+        logging.info(f"Video at {profile.name} is {size / 1024:.0f} KB attached, over budget; trying a smaller profile")
+        os.remove(output_path)
+        # The rate cap overshot; tighten it by the same ratio for the next profile
+        video_kbps = int(video_kbps * budget_bytes / size * SIZE_HEADROOM)
+    return None
+
+
+def make_thumbnail(source: str, output_path: str, width: int = 480) -> str:
+    """Save a JPEG preview of the video's first frame."""
+    command = [_ffmpeg(), '-y', '-loglevel', 'error', '-i', source, '-frames:v', '1',
+               '-vf', f"scale={width}:-2", '-q:v', '4', output_path]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {result.stderr.decode(errors='replace').strip()}")
+    return output_path
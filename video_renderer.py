@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Tesphase Video Renderer
+Frame composition engine for the daily reminder videos. The background and any
+static text are rasterized once; per frame only the regions that change are
+recomposed.
+
+Longer or higher-resolution timelines can be rendered in parallel: the frame
+range is split into chunks that worker processes render into shared memory,
+and the parent hands the frames to the encoder in order, so the chunks join
+into one continuous, losslessly concatenated stream.
+"""
+
+import os
+import shutil
+import subprocess
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from text_layer import TextRenderer
+
+
+def make_gradient(width: int, height: int) -> np.ndarray:
+    """Build the green vertical gradient background with vectorized NumPy."""
+    color = (255 * (1 - np.arange(height) / height)).astype(np.uint8)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :, 1] = (color // 2)[:, None]
+    frame[:, :, 2] = (color // 2)[:, None]
+    return frame
+
+
+# Line masks are shared by every composer in the process
+text_renderer = TextRenderer()
+
+
+class FrameComposer:
+    """Composes video frames from a pre-rendered base and dynamic regions."""
+
+    def __init__(self, width: int, height: int, background: Optional[np.ndarray] = None):
+        self.width = width
+        self.height = height
+        self.base = background if background is not None else make_gradient(width, height)
+        self.frame = self.base.copy()
+        self.dynamic_layers: List[dict] = []
+
+    def draw_static(self, draw_fn: Callable[[ImageDraw.ImageDraw], None]):
+        """Rasterize static content into the base layer once."""
+        image = Image.fromarray(self.base)
+        draw_fn(ImageDraw.Draw(image))
+        self.base = np.array(image)
+        self.frame = self.base.copy()
+        for layer in self.dynamic_layers:
+            layer['last'] = None
+
+    def draw_text(self, xy: Tuple[int, int], text: str, font, fill: Tuple[int, int, int] = (255, 255, 255)):
+        """Blend a line of text into the base layer from the shared line cache."""
+        text_renderer.draw(self.base, xy, text, font, fill)
+        self.frame[:] = self.base
+        for layer in self.dynamic_layers:
+            layer['last'] = None
+
+    def add_dynamic_layer(self, box: Tuple[int, int, int, int],
+                          render_fn: Callable[[int], Optional[np.ndarray]]):
+        """Register a region (x, y, w, h) whose pixels come from render_fn(frame_index).
+
+        render_fn returns an (h, w, 3) uint8 array, or None to show the base
+        underneath. Returning the same array object as the previous frame marks
+        the region as unchanged, so it is not recomposed.
+        """
+        self.dynamic_layers.append({'box': box, 'render': render_fn, 'last': None, 'shown': False})
+
+    def compose(self, index: int) -> np.ndarray:
+        """Return frame `index`.
+
+        The returned array is an internal buffer that is updated in place on the
+        next call; copy it if it has to outlive that call.
+        """
+        for layer in self.dynamic_layers:
+            x, y, w, h = layer['box']
+            patch = layer['render'](index)
+            if patch is None:
+                if layer['shown']:
+                    self.frame[y:y + h, x:x + w] = self.base[y:y + h, x:x + w]
+                    layer['shown'] = False
+                layer['last'] = None
+                continue
+            if patch is layer['last']:
+                continue
+            self.frame[y:y + h, x:x + w] = patch
+            layer['last'] = patch
+            layer['shown'] = True
+        return self.frame
+
+
+def iter_frames(composer: FrameComposer, count: int):
+    """Yield `count` frames from the composer one at a time."""
+    for i in range(count):
+        yield composer.compose(i)
+
+
+# Each render worker process builds its own composer once
+_worker_composer: Optional[FrameComposer] = None
+
+
+def _init_render_worker(build_composer: Callable[[], FrameComposer]):
+    global _worker_composer
+    _worker_composer = build_composer()
+
+
+def _render_chunk(shm_name: str, start: int, end: int, shape: Tuple[int, int, int]) -> int:
+    """Render frames [start, end) into a shared memory slot."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = np.ndarray((end - start,) + shape, dtype=np.uint8, buffer=shm.buf)
+        for index in range(start, end):
+            frames[index - start] = _worker_composer.compose(index)
+        del frames
+    finally:
+        shm.close()
+    return start
+
+
+def iter_frames_parallel(build_composer: Callable[[], FrameComposer], count: int, size: Tuple[int, int],
+                         workers: Optional[int] = None, chunk_frames: int = 8,
+                         check_cancel: Optional[Callable[[], None]] = None):
+    """Yield `count` frames rendered by a pool of worker processes.
+
+    `build_composer` must be picklable (a module-level function or a
+    functools.partial of one); each worker calls it once. Chunks of
+    `chunk_frames` frames are rendered into shared memory slots, two per
+    worker so rendering runs ahead of the consumer, and yielded in order.
+    Like FrameComposer.compose(), each yielded frame is a view that is reused
+    once the consumer moves on; copy it if it has to be kept.
+
+    `check_cancel`, if given, is called before waiting on each chunk and may
+    raise to abandon the render. However the loop ends, queued chunks are
+    dropped, the pool is shut down and the shared memory is released.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield from iter_frames(build_composer(), count)
+        return
+
+    width, height = size
+    shape = (height, width, 3)
+    chunks = [(start, min(start + chunk_frames, count)) for start in range(0, count, chunk_frames)]
+    slots = [shared_memory.SharedMemory(create=True, size=chunk_frames * width * height * 3)
+             for _ in range(min(2 * workers, len(chunks)))]
+    free = list(range(len(slots)))
+    pending = deque()
+    next_chunk = 0
+    pool = ProcessPoolExecutor(workers, initializer=_init_render_worker, initargs=(build_composer,))
+    try:
+        while next_chunk < len(chunks) or pending:
+            while free and next_chunk < len(chunks):
+                slot = free.pop()
+                start, end = chunks[next_chunk]
+                future = pool.submit(_render_chunk, slots[slot].name, start, end, shape)
+                pending.append((slot, end - start, future))
+                next_chunk += 1
+            if check_cancel:
+                check_cancel()
+            slot, length, future = pending.popleft()
+            future.result()
+            frames = np.ndarray((length,) + shape, dtype=np.uint8, buffer=slots[slot].buf)
+            for i in range(length):
+                yield frames[i]
+            del frames
+            free.append(slot)
+    finally:
+        # Chunks already rendering finish first, so no worker writes to a
+        # slot after it is unlinked
+        pool.shutdown(wait=True, cancel_futures=True)
+        for shm in slots:
+            try:
+                shm.close()
+            except BufferError:
+                # A consumer still holds a view of the last frame
+                pass
+            shm.unlink()
+
+
+def write_frames(frames, video_path: str, fps: int, size: Tuple[int, int]) -> str:
+    """Stream frames into an OpenCV mp4v writer as they are produced."""
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(video_path, fourcc, fps, size)
+    try:
+        for frame in frames:
+            out.write(frame)
+    finally:
+        out.release()
+    return video_path
+
+
+def find_ffmpeg() -> Optional[str]:
+    """Locate an ffmpeg binary: FFMPEG_BINARY, moviepy's bundled copy, then PATH."""
+    binary = os.getenv('FFMPEG_BINARY')
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which('ffmpeg')
+
+
+@lru_cache(maxsize=None)
+def vfr_options(ffmpeg: str) -> List[str]:
+    """Options for variable frame rate output: -fps_mode (ffmpeg 5.1+), or -vsync on older builds."""
+    try:
+        result = subprocess.run([ffmpeg, '-hide_banner', '-h', 'long'], capture_output=True)
+    except OSError:
+        return ['-vsync', 'vfr']
+    return ['-fps_mode', 'vfr'] if b'-fps_mode' in result.stdout else ['-vsync', 'vfr']
+
+
+def encode_with_ffmpeg(frames, output_path: str, fps: int, size: Tuple[int, int],
+                       audio_path: Optional[str] = None, duration: Optional[float] = None) -> str:
+    """Pipe raw frames (and optional narration audio) into a single ffmpeg encode.
+
+    Frames are interpreted as BGR, matching what cv2.VideoWriter receives, so
+    the output looks the same as the two-pass mp4v + libx264 path.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found; set FFMPEG_BINARY or install imageio-ffmpeg")
+
+    width, height = size
+    command = [
+        ffmpeg, '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps),
+        '-i', '-',
+    ]
+    if audio_path:
+        command += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0', '-c:a', 'aac']
+    command += ['-c:v', 'libx264', '-pix_fmt', 'yuv420p']
+    if duration:
+        # Trim narration that runs longer than the video
+        command += ['-t', str(duration)]
+    command.append(output_path)
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for frame in frames:
+            process.stdin.write(frame.tobytes())
+    except BrokenPipeError:
+        pass
+    finally:
+        process.stdin.close()
+        stderr = process.stderr.read()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({process.returncode}): {stderr.decode(errors='replace').strip()}")
+    return output_path
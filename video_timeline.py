@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tesphase Video Timeline
+Keyframe-plus-hold rendering for videos that are mostly still images.
+
+A timeline is a list of segments: stills held for a duration, and animations
+rendered frame by frame. Runs of identical frames collapse into a single
+keyframe with a duration, and the keyframes are handed to one ffmpeg encode
+through the concat demuxer with a variable frame rate. A still therefore
+costs one rendered and one encoded frame, however long it stays on screen.
+"""
+
+import os
+import subprocess
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from video_renderer import find_ffmpeg, vfr_options
+
+
+class Timeline:
+    """An ordered sequence of held stills and animated segments."""
+
+    def __init__(self, fps: int, max_hold: float = 1.0):
+        self.fps = fps
+        # Long holds are repeated every `max_hold` seconds so players can seek
+        self.max_hold = max_hold
+        self.segments: List[Tuple[str, object, float]] = []
+
+    @property
+    def duration(self) -> float:
+        return sum(duration for _, _, duration in self.segments)
+
+    def add_still(self, image: np.ndarray, duration: float):
+        """Hold a BGR image on screen for `duration` seconds."""
+        self.segments.append(('still', image.copy(), duration))
+
+    def add_animation(self, frames: Iterable[np.ndarray], duration: float):
+        """Show frames at the timeline's fps for `duration` seconds.
+
+        `frames` may be any frame iterator (iter_frames, iter_frames_parallel);
+        it is consumed lazily while encoding, and frames that repeat the
+        previous one extend its hold instead of adding a keyframe.
+        """
+        self.segments.append(('animation', frames, duration))
+
+    def keyframes(self) -> Iterator[Tuple[np.ndarray, float]]:
+        """Yield (frame, seconds on screen) with runs of identical frames merged."""
+        held, hold = None, 0.0
+        for kind, content, duration in self.segments:
+            if kind == 'still':
+                frames = [(content, duration)]
+            else:
+                count = round(duration * self.fps)
+                frames = ((frame, 1 / self.fps) for _, frame in zip(range(count), content))
+            for frame, seconds in frames:
+                if held is not None and np.array_equal(frame, held):
+                    hold += seconds
+                    continue
+                if held is not None:
+                    yield held, hold
+                held, hold = frame.copy(), seconds
+        if held is not None:
+            yield held, hold
+
+    def encode(self, output_path: str, audio_path: Optional[str] = None, crf: int = 23) -> str:
+        """Encode the timeline (and optional narration) into an H.264 MP4."""
+        ffmpeg = find_ffmpeg()
+        if not ffmpeg:
+            raise RuntimeError("ffmpeg not found; set FFMPEG_BINARY or install imageio-ffmpeg")
+
+        with tempfile.TemporaryDirectory(prefix='timeline_') as work_dir:
+            list_path = os.path.join(work_dir, 'timeline.ffconcat')
+            with open(list_path, 'w') as listing:
+                listing.write("ffconcat version 1.0\n")
+                image_path = None
+                for index, (frame, seconds) in enumerate(self.keyframes()):
+                    image_path = os.path.join(work_dir, f"key_{index:05d}.png")
+                    cv2.imwrite(image_path, frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+                    while seconds > 1e-9:
+                        hold = min(seconds, self.max_hold)
+                        listing.write(f"file '{image_path}'\nduration {hold:.6f}\n")
+                        seconds -= hold
+                if image_path is None:
+                    raise ValueError("Timeline is empty")
+                # The concat demuxer ignores the last entry's duration unless
+                # the file is listed once more
+                listing.write(f"file '{image_path}'\n")
+
+            command = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path]
+            if audio_path:
+                # Trim narration that runs longer than the timeline
+                command += ['-t', f"{self.duration:.6f}", '-i', audio_path,
+                            '-map', '0:v:0', '-map', '1:a:0', '-c:a', 'aac']
+            command += ['-c:v', 'libx264', '-crf', str(crf), '-pix_fmt', 'yuv420p',
+                        *vfr_options(ffmpeg), '-enc_time_base', '1/90000', output_path]
+            result = subprocess.run(command, capture_output=True)
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg failed ({result.returncode}): {result.stderr.decode(errors='replace').strip()}")
+        return output_path